@@ -1,5 +1,162 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (Cursor, CursorPagination,
+                                       PageNumberPagination, _reverse_ordering)
 
 
 class CustomSetPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+def keyset_condition(ordering, position, reverse=False):
+    '''Условие "строго после позиции" для составного порядка.
+
+    ordering - поля сортировки в формате order_by, position - значения
+    этих полей у последней выданной записи. Для (-a, -id) получается
+    a < v OR (a = v AND id < pk): такое условие обслуживается индексом
+    по тем же полям при любом числе одинаковых значений a.
+    '''
+    conditions = []
+    equal = {}
+    for field, value in zip(ordering, position):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') != reverse else 'gt'
+        conditions.append(Q(**equal, **{f'{name}__{lookup}': value}))
+        equal[name] = value
+    return reduce(or_, conditions)
+
+
+class RecipeCursorPagination(CursorPagination):
+    '''Курсорная (keyset) пагинация ленты рецептов.
+
+    Порядок задает RecipeOrderingFilter представления, по умолчанию -
+    (date_created, id); последним полем порядка всегда идет id. В
+    отличие от CursorPagination, позиция курсора содержит значения всех
+    полей порядка, поэтому записи с одинаковым значением первого поля
+    (например, favorites_count = 0) листаются условием по составному
+    ключу, а не смещением, ограниченным offset_cutoff.
+    '''
+    page_size_query_param = 'limit'
+    ordering = ('-date_created', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            reverse, current_position = False, None
+        else:
+            _, reverse, current_position = self.cursor
+
+        queryset = self.filter_after(queryset, current_position, reverse)
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following = len(results) > len(self.page)
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None
+            self.has_previous = has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = current_position is not None
+        self.set_positions(current_position)
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def decode_position(self, current_position):
+        '''Значения полей порядка из позиции курсора.'''
+        try:
+            position = json.loads(current_position)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if (not isinstance(position, list)
+                or len(position) != len(self.ordering)):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def filter_after(self, queryset, current_position, reverse):
+        '''Упорядоченный queryset, начиная сразу после позиции курсора.'''
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if current_position is None:
+            return queryset
+        position = self.decode_position(current_position)
+        try:
+            return queryset.filter(
+                keyset_condition(self.ordering, position, reverse)
+            )
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def set_positions(self, current_position):
+        '''Позиции для ссылок на соседние страницы - по крайним
+        записям текущей страницы.
+        '''
+        if not self.page:
+            self.previous_position = self.next_position = current_position
+            return
+        self.previous_position = self._get_position_from_instance(
+            self.page[0], self.ordering
+        )
+        self.next_position = self._get_position_from_instance(
+            self.page[-1], self.ordering
+        )
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=False, position=self.next_position)
+        )
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=True, position=self.previous_position)
+        )
+
+    def _get_position_from_instance(self, instance, ordering):
+        # str(float) точно восстанавливает то же значение double, поэтому
+        # ранг поиска (приведенный к double, см. recipes.search) годится
+        # для сравнения на равенство.
+        return json.dumps([
+            str(getattr(instance, field.lstrip('-'))) for field in ordering
+        ])
+
+
+class RecipeSetPagination(CustomSetPagination):
+    '''Пагинация рецептов: page/limit по умолчанию, курсорная - по запросу.
+
+    Если в запросе передан параметр cursor (в т.ч. пустой - для первой
+    страницы), выдача строится курсорной пагинацией, и стоимость
+    дальних страниц не растет с их номером.
+    '''
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        cursor_query_param = RecipeCursorPagination.cursor_query_param
+        if cursor_query_param in request.query_params:
+            self.cursor_paginator = RecipeCursorPagination()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
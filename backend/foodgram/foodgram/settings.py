@@ -46,6 +46,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',                            # AVC
     'rest_framework.authtoken',                  # AVC
     'djoser',                                    # AVC
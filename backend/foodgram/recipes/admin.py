@@ -1,5 +1,4 @@
 from django.contrib import admin
-from django.db.models import Count
 from django.utils.safestring import mark_safe
 
 from .models import (Favorite, Ingredient, IngredientRecipe, Measurement,
@@ -19,20 +18,15 @@ class TagRecipeInline(admin.TabularInline):
 
 
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author', 'favorite_count', 'image_tag')
+    list_display = (
+        'name', 'author', 'favorites_count', 'in_carts_count', 'image_tag'
+    )
     list_filter = ('author', 'name', 'tags',)
     inlines = [
         IngredientRecipeInline,
         TagRecipeInline,
     ]
 
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        return qs.annotate(favorite_count=Count('favorited'))
-
-    def favorite_count(self, obj):
-        return obj.favorite_count
-
     def image_tag(self, obj):
         return mark_safe('<img src="{}" height="50"/>'.format(obj.image.url))
 
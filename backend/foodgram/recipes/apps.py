@@ -5,5 +5,7 @@ class RecipesConfig(AppConfig):
     name = 'recipes'
 
     def ready(self):
-        from .signals import recipe_signals
+        from .signals import (counter_signals, feed_signals,  # noqa
+                              ingredient_signals, recipe_signals,
+                              shopping_cart_signals, similar_signals)
         print('---------------------', recipe_signals.__name__)
@@ -0,0 +1,36 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# Общий пул фоновых задач приложения: варианты изображений, ленты,
+# похожие рецепты.
+executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'BACKGROUND_WORKERS', 2),
+    thread_name_prefix='recipes-background',
+)
+
+
+def run_task(func, *args):
+    '''Выполняет func(*args) с записью ошибки в лог; соединение потока
+    с БД закрывается после каждой задачи.
+    '''
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Background task %s%r failed', func.__name__, args)
+    finally:
+        connection.close()
+
+
+def submit(func, *args):
+    '''Сразу ставит func(*args) в очередь фонового пула.'''
+    return executor.submit(run_task, func, *args)
+
+
+def schedule(func, *args):
+    '''Запускает func(*args) в фоновом пуле после коммита.'''
+    transaction.on_commit(lambda: submit(func, *args))
@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F
+
+from users.models import Follow
+
+from .models import Favorite, Recipe, ShoppingCart
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+
+# (модель со счетчиком, поле счетчика, модель связи, поле связи)
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follow, 'author'),
+)
+
+
+def change_counter(model, pk, field, delta):
+    '''Атомарно изменяет счетчик на delta одним UPDATE без чтения.'''
+    model.objects.filter(pk=pk).update(**{field: F(field) + delta})
+
+
+def reconcile_counter(model, field, related_model, related_field,
+                      batch_size=BATCH_SIZE):
+    '''Пересчитывает счетчик пачками по batch_size записей и
+    исправляет расхождения. Возвращает число исправленных записей.
+    '''
+    fixed = 0
+    last_pk = 0
+    while True:
+        rows = list(
+            model.objects.filter(pk__gt=last_pk)
+            .order_by('pk').values_list('pk', field)[:batch_size]
+        )
+        if not rows:
+            return fixed
+        last_pk = rows[-1][0]
+        actual = dict(
+            related_model.objects.filter(
+                **{f'{related_field}__in': [pk for pk, _ in rows]}
+            ).values(related_field).annotate(
+                count=Count('pk')
+            ).values_list(related_field, 'count')
+        )
+        drifted = [
+            model(pk=pk, **{field: actual.get(pk, 0)})
+            for pk, stored in rows if stored != actual.get(pk, 0)
+        ]
+        model.objects.bulk_update(drifted, [field])
+        fixed += len(drifted)
@@ -0,0 +1,159 @@
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
+
+from users.models import Follow
+
+from .models import FeedEntry, Recipe
+
+# Максимальная длина ленты пользователя.
+FEED_MAX_LENGTH = getattr(settings, 'FEED_MAX_LENGTH', 500)
+# Рецепты авторов с таким числом подписчиков не рассылаются по лентам,
+# а подмешиваются при чтении.
+FEED_FANOUT_MAX_FOLLOWERS = getattr(
+    settings, 'FEED_FANOUT_MAX_FOLLOWERS', 1000
+)
+BATCH_SIZE = 1000
+
+
+def is_big_author(author):
+    return author.followers_count >= FEED_FANOUT_MAX_FOLLOWERS
+
+
+def rebuild_feed(user_id):
+    '''Собирает ленту пользователя заново по текущим подпискам.'''
+    with transaction.atomic():
+        FeedEntry.objects.filter(user=user_id).delete()
+        authors = Follow.objects.filter(
+            user=user_id,
+            author__followers_count__lt=FEED_FANOUT_MAX_FOLLOWERS,
+        ).values('author')
+        recipes = Recipe.objects.filter(author__in=authors).order_by(
+            '-date_created', '-id'
+        ).values_list('id', 'date_created')[:FEED_MAX_LENGTH]
+        FeedEntry.objects.bulk_create([
+            FeedEntry(user_id=user_id, recipe_id=pk, date_created=created)
+            for pk, created in recipes
+        ])
+
+
+def trim_feeds(user_ids):
+    '''Обрезает ленты пользователей до FEED_MAX_LENGTH записей одним
+    запросом на пачку пользователей.
+    '''
+    oldest_kept = FeedEntry.objects.filter(
+        user=OuterRef('user')
+    ).order_by('-date_created').values('date_created')[
+        FEED_MAX_LENGTH - 1:FEED_MAX_LENGTH
+    ]
+    FeedEntry.objects.filter(
+        user__in=user_ids, date_created__lt=Subquery(oldest_kept)
+    ).delete()
+
+
+def fan_out(recipe_id):
+    '''Добавляет рецепт в ленты подписчиков автора пачками.'''
+    recipe = Recipe.objects.select_related('author').filter(
+        pk=recipe_id
+    ).first()
+    if recipe is None or is_big_author(recipe.author):
+        return
+    followers = Follow.objects.filter(
+        author=recipe.author_id
+    ).values_list('user_id', flat=True).order_by('user_id')
+    batch = []
+    for user_id in followers.iterator():
+        batch.append(user_id)
+        if len(batch) >= BATCH_SIZE:
+            _fan_out_batch(recipe, batch)
+            batch = []
+    if batch:
+        _fan_out_batch(recipe, batch)
+
+
+def _fan_out_batch(recipe, user_ids):
+    FeedEntry.objects.bulk_create([
+        FeedEntry(
+            user_id=user_id, recipe=recipe,
+            date_created=recipe.date_created,
+        )
+        for user_id in user_ids
+    ], ignore_conflicts=True)
+    trim_feeds(user_ids)
+
+
+def backfill(user_id, author_id):
+    '''Добавляет в ленту последние рецепты нового автора подписки.
+
+    Рецепты крупных авторов не копируются - они подмешиваются при
+    чтении.
+    '''
+    if not Follow.objects.filter(user=user_id, author=author_id).exists():
+        return
+    recipes = Recipe.objects.filter(
+        author=author_id, author__followers_count__lt=FEED_FANOUT_MAX_FOLLOWERS
+    ).order_by('-date_created', '-id').values_list(
+        'id', 'date_created'
+    )[:FEED_MAX_LENGTH]
+    FeedEntry.objects.bulk_create([
+        FeedEntry(user_id=user_id, recipe_id=pk, date_created=date_created)
+        for pk, date_created in recipes
+    ], ignore_conflicts=True)
+    trim_feeds([user_id])
+
+
+def remove_author(user_id, author_id):
+    '''Убирает из ленты рецепты автора, от которого отписались.'''
+    FeedEntry.objects.filter(
+        user=user_id, recipe__author=author_id
+    ).delete()
+
+
+def encode_cursor(date_created, recipe_id):
+    return f'{date_created.isoformat()}_{recipe_id}'
+
+
+def decode_cursor(cursor):
+    '''Позиция (date_created, id) из курсора или ValueError.'''
+    date_created, recipe_id = cursor.rsplit('_', 1)
+    return datetime.fromisoformat(date_created), int(recipe_id)
+
+
+def before(position, date_field, id_field):
+    '''Условие "строго раньше позиции" для порядка (date_created, id).'''
+    if position is None:
+        return Q()
+    date_created, recipe_id = position
+    return Q(**{f'{date_field}__lt': date_created}) | Q(
+        **{date_field: date_created, f'{id_field}__lt': recipe_id}
+    )
+
+
+def get_feed_page(user, limit, position=None):
+    '''Страница ленты: список (date_created, id) рецептов не длиннее
+    limit, начиная после position, и признак наличия следующей.
+
+    Лента читается проходом по индексу записей пользователя; рецепты
+    крупных авторов из подписок берутся запросом по индексу
+    (author, date_created, id) и сливаются с лентой.
+    '''
+    rows = list(
+        FeedEntry.objects.filter(
+            before(position, 'date_created', 'recipe_id'), user=user
+        ).order_by('-date_created', '-recipe_id').values_list(
+            'date_created', 'recipe_id'
+        )[:limit + 1]
+    )
+    big_authors = Follow.objects.filter(
+        user=user,
+        author__followers_count__gte=FEED_FANOUT_MAX_FOLLOWERS,
+    ).values('author')
+    rows += Recipe.objects.filter(
+        before(position, 'date_created', 'id'), author__in=big_authors
+    ).order_by('-date_created', '-id').values_list(
+        'date_created', 'id'
+    )[:limit + 1]
+    rows = sorted(set(rows), reverse=True)
+    return rows[:limit], len(rows) > limit
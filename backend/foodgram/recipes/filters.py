@@ -1,20 +1,37 @@
 from django_filters import (CharFilter, FilterSet, ModelMultipleChoiceFilter,
-                            NumberFilter)
+                            NumberFilter, RangeFilter)
+from rest_framework.filters import OrderingFilter
 
 from .models import Ingredient, Recipe, Tag
+from .search import filter_full_text, filter_name_contains, filter_name_similar
 
 
 class IngredientFilterBackend(FilterSet):
     '''Фильтр ингредиентов по первым буквам в форме создания рецепта.'''
     name = CharFilter(lookup_expr='startswith')
+    name_contains = CharFilter(method='filter_name_contains')
+    name_similar = CharFilter(method='filter_name_similar')
 
     class Meta:
         model = Ingredient
-        fields = ['name', ]
+        fields = ['name', 'name_contains', 'name_similar']
+
+    def filter_name_contains(self, queryset, name, value):
+        return filter_name_contains(queryset, value).order_by(
+            '-search_rank', 'search_name'
+        )
+
+    def filter_name_similar(self, queryset, name, value):
+        return filter_name_similar(queryset, value).order_by(
+            '-search_rank', 'search_name'
+        )
 
 
 class RecipeFilterBackend(FilterSet):
-    '''Фильтр рецептов по id автора, тегам, избранному, списку покупок.'''
+    '''Фильтр рецептов по id автора, тегам, избранному, списку покупок,
+    времени приготовления (cooking_time_min, cooking_time_max) и поиск
+    по названию и описанию.
+    '''
     tags = ModelMultipleChoiceFilter(
         field_name='tags__slug',
         to_field_name='slug',
@@ -22,10 +39,17 @@ class RecipeFilterBackend(FilterSet):
     )
     is_favorited = NumberFilter(method='filter_is_favorited')
     is_in_shopping_cart = NumberFilter(method='filter_is_in_shopping_cart')
+    cooking_time = RangeFilter()
+    name_contains = CharFilter(method='filter_name_contains')
+    name_similar = CharFilter(method='filter_name_similar')
+    search = CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
-        fields = ['author', 'tags', 'is_favorited', 'is_in_shopping_cart']
+        fields = [
+            'author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+            'cooking_time', 'name_contains', 'name_similar', 'search',
+        ]
 
     def filter_is_favorited(self, queryset, name, value):
         curr_user = self.request.user.pk
@@ -38,3 +62,54 @@ class RecipeFilterBackend(FilterSet):
         if value == 1 or value is True:
             return queryset.filter(in_shopping_cart__user=curr_user)
         return queryset
+
+    def filter_name_contains(self, queryset, name, value):
+        return filter_name_contains(queryset, value)
+
+    def filter_name_similar(self, queryset, name, value):
+        return filter_name_similar(queryset, value)
+
+    def filter_search(self, queryset, name, value):
+        return filter_full_text(queryset, value)
+
+
+class RecipeOrderingFilter(OrderingFilter):
+    '''Сортировка рецептов: при поиске сначала по рангу
+    совпадения, затем по заданному или стандартному порядку.
+
+    Доступны только ключи из ORDERING_KEYS (ordering=-popularity,
+    ordering=cooking_time и т.п.). Порядок всегда заканчивается полем
+    id, так что он однозначен, совпадает с индексом (поле, id) модели
+    Recipe и годится для курсорной пагинации по составному ключу
+    (RecipeCursorPagination).
+    '''
+    ORDERING_KEYS = {
+        'popularity': 'favorites_count',
+        'cooking_time': 'cooking_time',
+        'recency': 'date_created',
+    }
+
+    def get_ordering(self, request, queryset, view):
+        ordering = self.get_requested_ordering(request)
+        if ordering is None:
+            ordering = self.get_default_ordering(view) or ()
+        ordering = tuple(ordering)
+        if not ordering or ordering[-1].lstrip('-') not in ('id', 'pk'):
+            ordering += ('-id',)
+        if 'search_rank' in queryset.query.annotations:
+            return ('-search_rank',) + ordering
+        return ordering
+
+    def get_requested_ordering(self, request):
+        param = request.query_params.get(self.ordering_param)
+        if not param:
+            return None
+        descending = param.startswith('-')
+        field = self.ORDERING_KEYS.get(param.lstrip('-'))
+        if field is None:
+            return None
+        prefix = '-' if descending else ''
+        return (f'{prefix}{field}', f'{prefix}id')
+
+    def get_valid_fields(self, queryset, view, context={}):
+        return [(key, key) for key in self.ORDERING_KEYS]
@@ -0,0 +1,15 @@
+import hashlib
+
+
+def get_text_hash(text):
+    '''SHA-256 текста в шестнадцатеричном виде.'''
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def get_file_hash(file):
+    '''SHA-256 содержимого файла; файл читается частями.'''
+    hasher = hashlib.sha256()
+    for chunk in file.chunks():
+        hasher.update(chunk)
+    file.seek(0)
+    return hasher.hexdigest()
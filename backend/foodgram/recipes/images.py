@@ -0,0 +1,205 @@
+import io
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image
+
+from .background import schedule, submit
+from .models import PendingImageDeletion, Recipe
+
+IMAGE_VARIANT_SIZES = getattr(settings, 'IMAGE_VARIANT_SIZES', {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+})
+# Форматы вариантов: {формат: расширение}. Не зависят от расширения
+# загруженного файла, чтобы варианты одного содержимого (хэша) были
+# одинаковыми у всех рецептов.
+VARIANT_FORMATS = {'webp': '.webp', 'jpeg': '.jpg'}
+PILLOW_FORMATS = {'.webp': 'WEBP', '.jpg': 'JPEG'}
+
+DELETION_BATCH_SIZE = 500
+# Файлы, измененные (в т.ч. повторно загруженные) недавнее этого срока,
+# не удаляются: ссылающийся на них рецепт может быть еще не закоммичен.
+DELETION_GRACE_SECONDS = getattr(settings, 'IMAGE_DELETION_GRACE_SECONDS', 600)
+
+_deletions_scheduled = threading.Event()
+
+
+def get_variant_names(image_hash):
+    '''Имена производных изображений: {размер: {формат: имя файла}}.
+
+    Имена выводятся только из хэша исходного изображения, поэтому
+    одинаковые картинки разных рецептов (в т.ч. загруженные с разными
+    расширениями) используют одни и те же варианты.
+    '''
+    base = f'recipes/images/variants/{image_hash[:2]}/{image_hash}'
+    return {
+        size_name: {
+            format: f'{base}_{size_name}{format_ext}'
+            for format, format_ext in VARIANT_FORMATS.items()
+        }
+        for size_name in IMAGE_VARIANT_SIZES
+    }
+
+
+def flatten(image):
+    '''Изображение без прозрачности на белом фоне - для JPEG.'''
+    image = image.convert('RGBA')
+    background = Image.new('RGB', image.size, 'white')
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def get_variant_urls(recipe, request=None):
+    '''Ссылки на варианты изображения рецепта или None, пока их нет.'''
+    if not recipe.has_image_variants or not recipe.image_hash:
+        return None
+    storage = recipe.image.storage
+    urls = {}
+    for size_name, names in get_variant_names(recipe.image_hash).items():
+        urls[size_name] = {}
+        for format, name in names.items():
+            url = storage.url(name)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            urls[size_name][format] = url
+    return urls
+
+
+def generate_variants(recipe_model, image_name, image_hash):
+    '''Создает недостающие варианты изображения и отмечает рецепты.'''
+    field = recipe_model._meta.get_field('image')
+    storage = field.storage
+    names = get_variant_names(image_hash)
+    pending = [
+        (size_name, format, name)
+        for size_name, formats in names.items()
+        for format, name in formats.items()
+        if not storage.exists(name)
+    ]
+    if pending:
+        with storage.open(image_name) as file:
+            original = Image.open(file)
+            original.load()
+        for size_name, format, name in pending:
+            variant = original.copy()
+            variant.thumbnail(IMAGE_VARIANT_SIZES[size_name])
+            pillow_format = PILLOW_FORMATS[os.path.splitext(name)[1]]
+            if pillow_format == 'JPEG' and variant.mode not in ('RGB', 'L'):
+                variant = flatten(variant)
+            buffer = io.BytesIO()
+            variant.save(buffer, format=pillow_format)
+            storage.save(name, ContentFile(buffer.getvalue()))
+    recipe_model.objects.filter(image_hash=image_hash).update(
+        has_image_variants=True
+    )
+
+
+def schedule_variants(recipe):
+    '''Ставит генерацию вариантов в фоновый поток после коммита.'''
+    schedule(
+        generate_variants, type(recipe), recipe.image.name, recipe.image_hash
+    )
+
+
+def iter_variant_names(image_hash):
+    for formats in get_variant_names(image_hash).values():
+        yield from formats.values()
+
+
+def delete_variants(image_hash, storage):
+    for name in iter_variant_names(image_hash):
+        storage.delete(name)
+
+
+def queue_image_deletion(image_name, image_hash):
+    '''Ставит файл в очередь на удаление в текущей транзакции;
+    обработка очереди запускается после коммита.
+    '''
+    PendingImageDeletion.objects.bulk_create(
+        [PendingImageDeletion(name=image_name, image_hash=image_hash)],
+        ignore_conflicts=True,
+    )
+    transaction.on_commit(schedule_image_deletions)
+
+
+def schedule_image_deletions():
+    '''Запускает обработку очереди в фоне, если она еще не запущена.'''
+    if not _deletions_scheduled.is_set():
+        _deletions_scheduled.set()
+        submit(_process_image_deletions_task)
+
+
+def is_recent(storage, name, deadline):
+    '''Изменен ли файл позже deadline (отсутствующий - нет).'''
+    try:
+        return os.stat(storage.path(name)).st_mtime > deadline
+    except FileNotFoundError:
+        return False
+
+
+def delete_batch(batch, storage, deadline):
+    '''Удаляет файлы пачки очереди без ссылок и старше deadline.
+
+    Варианты общие для всех рецептов с тем же хэшем, поэтому
+    удаляются, только если хэш не использует ни один рецепт.
+    Возвращает id обработанных записей очереди и число удаленных файлов.
+    '''
+    referenced = set(
+        Recipe.objects.filter(
+            image__in=[item.name for item in batch]
+        ).values_list('image', flat=True)
+    )
+    live_hashes = set(
+        Recipe.objects.filter(
+            image_hash__in={item.image_hash for item in batch}
+        ).values_list('image_hash', flat=True)
+    )
+    done = []
+    deleted = 0
+    for item in batch:
+        if item.name not in referenced:
+            if is_recent(storage, item.name, deadline):
+                continue
+            if item.image_hash and item.image_hash not in live_hashes:
+                delete_variants(item.image_hash, storage)
+            storage.delete(item.name)
+            deleted += 1
+        done.append(item.id)
+    return done, deleted
+
+
+def process_image_deletions(batch_size=DELETION_BATCH_SIZE):
+    '''Удаляет файлы из очереди пачками по batch_size.
+
+    Файл, на который снова ссылается какой-либо рецепт (то же
+    содержимое загружено повторно), остается в хранилище. Файл моложе
+    DELETION_GRACE_SECONDS остается в очереди до следующего
+    запуска: его могли только что загрузить повторно в еще не
+    закоммиченной транзакции. Возвращает число удаленных файлов.
+    '''
+    storage = Recipe._meta.get_field('image').storage
+    deadline = time.time() - DELETION_GRACE_SECONDS
+    deleted = 0
+    last_id = 0
+    while True:
+        batch = list(
+            PendingImageDeletion.objects.filter(
+                id__gt=last_id
+            ).order_by('id')[:batch_size]
+        )
+        if not batch:
+            return deleted
+        last_id = batch[-1].id
+        done, batch_deleted = delete_batch(batch, storage, deadline)
+        deleted += batch_deleted
+        PendingImageDeletion.objects.filter(id__in=done).delete()
+
+
+def _process_image_deletions_task():
+    _deletions_scheduled.clear()
+    process_image_deletions()
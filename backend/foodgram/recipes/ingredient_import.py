@@ -0,0 +1,116 @@
+import csv
+import json
+import os
+
+from django.db import transaction
+from django.db.models import Min
+
+from .ingredient_index import ingredient_index
+from .models import Ingredient, Measurement
+from .search import normalize_name
+
+BATCH_SIZE = 1000
+
+
+def read_rows(path):
+    '''Строки (название, ед. измерения) из CSV без заголовка или из
+    JSON-списка объектов с полями name и measurement_unit.
+    '''
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, encoding='utf-8') as file:
+        if ext == '.json':
+            for item in json.load(file):
+                yield item['name'], item['measurement_unit']
+        elif ext == '.csv':
+            for row in csv.reader(file):
+                if row:
+                    yield row[0], row[1]
+        else:
+            raise ValueError(f'Неподдерживаемый формат файла: {ext}')
+
+
+def deduplicate(rows):
+    '''Оставляет для каждого названия последнюю строку.
+
+    Дубликаты определяются по нормализованному названию, поэтому
+    "Сахар" и "сахар" - один ингредиент. Возвращает словарь
+    {нормализованное название: (название, ед. измерения)} и число
+    отброшенных дубликатов.
+    '''
+    unique = {}
+    duplicates = 0
+    for name, unit in rows:
+        name, unit = name.strip(), unit.strip()
+        if not name or not unit:
+            continue
+        key = normalize_name(name)
+        if key in unique:
+            duplicates += 1
+            del unique[key]
+        unique[key] = (name, unit)
+    return unique, duplicates
+
+
+def get_measurement_ids(names):
+    '''Идентификаторы единиц измерения по названиям, недостающие
+    единицы создаются одним запросом.
+    '''
+    def existing():
+        return dict(
+            Measurement.objects.filter(name__in=names)
+            .values('name').annotate(id=Min('id'))
+            .values_list('name', 'id')
+        )
+    ids = existing()
+    missing = [Measurement(name=name) for name in names if name not in ids]
+    if not missing:
+        return ids
+    Measurement.objects.bulk_create(missing, batch_size=BATCH_SIZE)
+    return existing()
+
+
+def import_ingredients(rows):
+    '''Идемпотентная загрузка справочника ингредиентов.
+
+    Существующие ингредиенты сопоставляются по нормализованному
+    названию одним запросом, новые добавляются через bulk_create,
+    изменившиеся - через bulk_update; все в одной транзакции.
+    Возвращает словарь со счетчиками inserted, updated, unchanged и
+    duplicates.
+    '''
+    unique, duplicates = deduplicate(rows)
+    with transaction.atomic():
+        unit_ids = get_measurement_ids({unit for _, unit in unique.values()})
+        existing = {}
+        for ingredient in (
+            Ingredient.objects.filter(search_name__in=list(unique))
+            .only('id', 'name', 'search_name', 'measurement_unit_id')
+            .order_by('-id')
+        ):
+            existing[ingredient.search_name] = ingredient
+        to_create, to_update = [], []
+        for key, (name, unit) in unique.items():
+            unit_id = unit_ids[unit]
+            ingredient = existing.get(key)
+            if ingredient is None:
+                to_create.append(Ingredient(
+                    name=name, search_name=key, measurement_unit_id=unit_id
+                ))
+            elif (ingredient.name, ingredient.measurement_unit_id) != (
+                name, unit_id
+            ):
+                ingredient.name = name
+                ingredient.measurement_unit_id = unit_id
+                to_update.append(ingredient)
+        Ingredient.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+        Ingredient.objects.bulk_update(
+            to_update, ['name', 'measurement_unit'], batch_size=BATCH_SIZE
+        )
+        if to_create or to_update:
+            transaction.on_commit(ingredient_index.invalidate)
+    return {
+        'inserted': len(to_create),
+        'updated': len(to_update),
+        'unchanged': len(unique) - len(to_create) - len(to_update),
+        'duplicates': duplicates,
+    }
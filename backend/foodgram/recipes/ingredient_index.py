@@ -0,0 +1,107 @@
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+from .models import Ingredient
+from .search import normalize_name
+from .versions import bump_version, get_version
+
+SEARCH_LIMIT = getattr(settings, 'INGREDIENT_SEARCH_LIMIT', 50)
+# Как часто (в секундах) процесс сверяет версию индекса с БД.
+CHECK_INTERVAL = getattr(settings, 'INGREDIENT_INDEX_CHECK_SECONDS', 2)
+VERSION_NAME = 'ingredients'
+
+
+class IngredientIndex:
+    '''Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Хранит отсортированный список нормализованных названий. Поиск по
+    префиксу - бинарный, по подстроке - проход по списку; к БД поиск не
+    обращается. Изменение ингредиентов (сигналы, загрузка справочника
+    командой) увеличивает версию индекса в таблице DataVersion; каждый
+    процесс сверяет ее не чаще раза в CHECK_INTERVAL секунд и
+    перестраивает индекс, увидев новую.
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = None
+        self._checked = 0
+        self._keys = []
+        self._items = []
+
+    def invalidate(self):
+        bump_version(VERSION_NAME)
+        self._generation = None
+        self._checked = 0
+
+    def _current_generation(self):
+        now = time.monotonic()
+        if self._generation is None or now - self._checked >= CHECK_INTERVAL:
+            self._checked = now
+            return get_version(VERSION_NAME)
+        return self._generation
+
+    def _build(self, generation):
+        ingredients = Ingredient.objects.select_related(
+            'measurement_unit'
+        ).order_by('search_name', 'id')
+        entries = sorted(
+            (
+                ingredient.search_name,
+                ingredient.id,
+                {
+                    'id': ingredient.id,
+                    'name': ingredient.name,
+                    'measurement_unit': str(ingredient.measurement_unit),
+                },
+            )
+            for ingredient in ingredients
+        )
+        self._keys = [key for key, _, _ in entries]
+        self._items = [item for _, _, item in entries]
+        self._generation = generation
+
+    def _ensure_built(self):
+        generation = self._current_generation()
+        if self._generation != generation:
+            with self._lock:
+                if self._generation != generation:
+                    self._build(generation)
+        return self._keys, self._items
+
+    def all(self):
+        return self._ensure_built()[1]
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        '''Ингредиенты, подходящие под query: сначала точные совпадения,
+        затем совпадения по началу названия, затем по подстроке.
+        '''
+        keys, items = self._ensure_built()
+        query = normalize_name(query.strip())
+        if not query:
+            return items[:limit]
+
+        result = []
+        start = bisect_left(keys, query)
+        index = start
+        while (
+            index < len(keys)
+            and keys[index].startswith(query)
+            and len(result) < limit
+        ):
+            result.append(items[index])
+            index += 1
+        if len(result) >= limit:
+            return result
+
+        for index, key in enumerate(keys):
+            if query in key and not key.startswith(query):
+                result.append(items[index])
+                if len(result) >= limit:
+                    break
+        return result
+
+
+ingredient_index = IngredientIndex()
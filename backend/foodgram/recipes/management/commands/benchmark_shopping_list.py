@@ -0,0 +1,36 @@
+import statistics
+import time
+
+from django.core.management import BaseCommand
+
+from recipes.shopping_list.pdf import ShoppingListPDFRenderer
+
+
+class Command(BaseCommand):
+    help = 'Замер времени формирования PDF-списка покупок без обращения к БД.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        rows = [
+            {
+                'name': f'ингредиент {i}',
+                'measurement_unit': 'г',
+                'total_amount': i,
+            }
+            for i in range(options['rows'])
+        ]
+        renderer = ShoppingListPDFRenderer(title='Список покупок')
+        timings = []
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            size = sum(len(chunk) for chunk in renderer.stream(rows))
+            timings.append((time.perf_counter() - start) * 1000)
+        self.stdout.write(
+            f'rows={options["rows"]} size={size} bytes '
+            f'min={min(timings):.1f}ms '
+            f'mean={statistics.mean(timings):.1f}ms '
+            f'max={max(timings):.1f}ms'
+        )
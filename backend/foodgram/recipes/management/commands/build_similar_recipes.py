@@ -0,0 +1,13 @@
+from django.core.management import BaseCommand
+
+from recipes.similarity import build_similar_recipes
+
+
+class Command(BaseCommand):
+    help = ('Полный пересчет таблицы похожих рецептов по составу '
+            '(MinHash/LSH). Изменения отдельных рецептов между '
+            'запусками учитываются автоматически.')
+
+    def handle(self, *args, **options):
+        count = build_similar_recipes()
+        self.stdout.write(f'Записей о похожих рецептах: {count}')
@@ -0,0 +1,56 @@
+import os
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from recipes.media_gc import collect_orphans, load_checkpoint, save_checkpoint
+from recipes.models import Recipe
+
+CHECKPOINT_FILE = getattr(
+    settings, 'MEDIA_GC_CHECKPOINT_FILE',
+    os.path.join(settings.BASE_DIR, '.media_gc_checkpoint'),
+)
+
+
+class Command(BaseCommand):
+    help = ('Поиск и удаление файлов изображений рецептов, на которые '
+            'не ссылается ни один рецепт. Без --delete только выводит '
+            'список. Прерванный запуск продолжается с места остановки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delete', action='store_true',
+            help='Удалять найденные файлы.',
+        )
+        parser.add_argument(
+            '--grace-hours', type=float, default=24,
+            help='Не трогать файлы моложе указанного числа часов.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать обход заново, игнорируя сохраненную позицию.',
+        )
+        parser.add_argument('--checkpoint', default=CHECKPOINT_FILE)
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint']
+        start_after = () if options['restart'] else load_checkpoint(checkpoint)
+        if start_after:
+            self.stdout.write(f'Продолжение после {"/".join(start_after)}')
+        found = 0
+        orphans = collect_orphans(
+            Recipe._meta.get_field('image').storage,
+            grace_seconds=options['grace_hours'] * 3600,
+            batch_size=options['batch_size'],
+            start_after=start_after,
+            delete=options['delete'],
+            on_batch=lambda parts: save_checkpoint(checkpoint, parts),
+        )
+        for name in orphans:
+            found += 1
+            self.stdout.write(name)
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        action = 'Удалено' if options['delete'] else 'Найдено'
+        self.stdout.write(f'{action} файлов без ссылок: {found}')
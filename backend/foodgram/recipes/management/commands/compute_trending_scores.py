@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand
+
+from recipes.trending import compute_trending_scores
+
+
+class Command(BaseCommand):
+    help = ('Пересчет оценок популярных сейчас рецептов по недавним '
+            'добавлениям в избранное и корзину. Запускается по '
+            'расписанию, например раз в несколько минут.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать оценки заново, а не инкрементально.',
+        )
+
+    def handle(self, *args, **options):
+        count = compute_trending_scores(options['full'])
+        self.stdout.write(f'Рецептов с оценкой: {count}')
@@ -0,0 +1,27 @@
+from django.core.management import BaseCommand
+
+from recipes.images import generate_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Создание уменьшенных изображений для рецептов, у которых '
+            'их еще нет (дозаполнение и повтор после сбоев).')
+
+    def handle(self, *args, **options):
+        images = Recipe.objects.filter(
+            has_image_variants=False, image_hash__isnull=False
+        ).values_list('image_hash', 'image').order_by('image_hash')
+        done = failed = 0
+        seen = set()
+        for image_hash, image_name in images.iterator():
+            if image_hash in seen:
+                continue
+            seen.add(image_hash)
+            try:
+                generate_variants(Recipe, image_name, image_hash)
+                done += 1
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f'{image_name}: {error}')
+        self.stdout.write(f'Готово: {done}, ошибок: {failed}')
@@ -0,0 +1,16 @@
+from django.core.management import BaseCommand
+
+from recipes.images import DELETION_BATCH_SIZE, process_image_deletions
+
+
+class Command(BaseCommand):
+    help = 'Удаление из хранилища изображений из очереди на удаление.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DELETION_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        deleted = process_image_deletions(options['batch_size'])
+        self.stdout.write(f'Удалено файлов: {deleted}')
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+
+from recipes.feed import rebuild_feed
+from users.models import Follow
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Пересборка лент подписок: первичное заполнение и '
+            'исправление после смены порога крупных авторов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append',
+            help='id пользователя; по умолчанию - все подписчики.',
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['user'] or (
+            Follow.objects.values_list('user_id', flat=True)
+            .distinct().order_by('user_id').iterator()
+        )
+        count = 0
+        for user_id in user_ids:
+            rebuild_feed(user_id)
+            count += 1
+        self.stdout.write(f'Пересобрано лент: {count}')
@@ -0,0 +1,21 @@
+from django.core.management import BaseCommand
+
+from recipes.counters import BATCH_SIZE, COUNTERS, reconcile_counter
+
+
+class Command(BaseCommand):
+    help = ('Пересчет счетчиков избранного, корзин, рецептов и '
+            'подписчиков с исправлением расхождений.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        for model, field, related_model, related_field in COUNTERS:
+            fixed = reconcile_counter(
+                model, field, related_model, related_field,
+                options['batch_size'],
+            )
+            self.stdout.write(
+                f'{model._meta.model_name}.{field}: исправлено {fixed}'
+            )
@@ -0,0 +1,140 @@
+import json
+import os
+import time
+
+from .images import iter_variant_names
+from .models import PendingImageDeletion, Recipe
+
+IMAGES_DIR = 'recipes/images'
+VARIANTS_DIR = 'recipes/images/variants'
+
+
+def walk_files(root, start_after=()):
+    '''Обходит файлы каталога root в порядке сортировки имен.
+
+    Возвращает кортежи частей относительного пути. Порядок обхода
+    совпадает с порядком сравнения кортежей, поэтому обход можно
+    продолжить с места остановки: поддеревья до start_after
+    пропускаются без чтения. В памяти держится содержимое только
+    текущих каталогов, а не весь список файлов.
+    '''
+    def walk(path, parts):
+        try:
+            with os.scandir(path) as entries:
+                entries = sorted(
+                    (entry.name, entry.is_dir(follow_symlinks=False))
+                    for entry in entries
+                )
+        except FileNotFoundError:
+            return
+        depth = len(parts) + 1
+        for name, is_dir in entries:
+            current = parts + (name,)
+            if current < start_after[:depth]:
+                continue
+            if is_dir:
+                yield from walk(os.path.join(path, name), current)
+            elif current != start_after:
+                yield current
+    yield from walk(root, ())
+
+
+def get_referenced(names):
+    '''Имена из names, на которые ссылаются рецепты или очередь удаления.
+
+    Исходные изображения проверяются по индексу Recipe.image,
+    варианты - по индексу Recipe.image_hash: хэш исходника стоит
+    в начале имени варианта. Варианты со старыми именами (не из
+    get_variant_names) считаются лишними.
+    '''
+    variant_hashes = {
+        name: os.path.basename(name).split('_', 1)[0]
+        for name in names if name.startswith(VARIANTS_DIR + '/')
+    }
+    originals = [name for name in names if name not in variant_hashes]
+    referenced = set(
+        Recipe.objects.filter(
+            image__in=originals
+        ).values_list('image', flat=True)
+    )
+    referenced.update(
+        PendingImageDeletion.objects.filter(
+            name__in=originals
+        ).values_list('name', flat=True)
+    )
+    live_hashes = set(
+        Recipe.objects.filter(
+            image_hash__in=set(variant_hashes.values())
+        ).values_list('image_hash', flat=True)
+    )
+    referenced.update(
+        name for name, image_hash in variant_hashes.items()
+        if image_hash in live_hashes
+        and name in iter_variant_names(image_hash)
+    )
+    return referenced
+
+
+def iter_batches(root, start_after=(), batch_size=1000):
+    '''Файлы каталога root (см. walk_files) пачками по batch_size.'''
+    batch = []
+    for parts in walk_files(root, start_after):
+        batch.append(parts)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def find_orphans(storage, names, deadline, delete=False):
+    '''Имена из names без ссылок, измененные не позже deadline;
+    при delete=True такие файлы удаляются.
+    '''
+    referenced = get_referenced(names)
+    orphans = []
+    for name in names:
+        if name in referenced:
+            continue
+        try:
+            if os.stat(storage.path(name)).st_mtime > deadline:
+                continue
+            if delete:
+                storage.delete(name)
+        except FileNotFoundError:
+            continue
+        orphans.append(name)
+    return orphans
+
+
+def collect_orphans(storage, grace_seconds, batch_size=1000,
+                    start_after=(), delete=False, on_batch=None):
+    '''Находит (и при delete=True удаляет) файлы изображений рецептов,
+    на которые ничего не ссылается и которые старше grace_seconds.
+
+    Файлы проверяются пачками по batch_size; после каждой пачки
+    вызывается on_batch(последний путь), чтобы сохранить
+    место остановки. Генератор возвращает пути найденных файлов.
+    '''
+    root = storage.path(IMAGES_DIR)
+    deadline = time.time() - grace_seconds
+    for batch in iter_batches(root, tuple(start_after), batch_size):
+        names = ['/'.join((IMAGES_DIR,) + parts) for parts in batch]
+        yield from find_orphans(storage, names, deadline, delete)
+        if on_batch:
+            on_batch(batch[-1])
+
+
+def load_checkpoint(path):
+    try:
+        with open(path) as file:
+            return tuple(json.load(file))
+    except FileNotFoundError:
+        return ()
+
+
+def save_checkpoint(path, parts):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(list(parts), file)
+    os.replace(tmp_path, path)
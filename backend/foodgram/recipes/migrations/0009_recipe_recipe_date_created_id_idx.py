@@ -0,0 +1,17 @@
+# Generated by Django 3.2.19 on 2026-10-18 16:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_auto_20230620_2120'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['date_created', 'id'], name='recipe_date_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.19 on 2026-10-18 16:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_auto_20230518_1639'),
+        ('recipes', '0009_recipe_recipe_date_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartVersion',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='shopping_cart_version', serialize=False, to='users.extuser', verbose_name='Покупатель')),
+                ('version', models.PositiveIntegerField(default=0, verbose_name='Версия корзины')),
+            ],
+            options={
+                'verbose_name': 'Версия корзины',
+                'verbose_name_plural': 'Версии корзин',
+            },
+        ),
+    ]
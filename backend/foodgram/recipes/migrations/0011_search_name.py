@@ -0,0 +1,70 @@
+# Generated by Django 3.2.19 on 2026-10-18 16:41
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+TRIGRAM_INDEXES = (
+    ('ingredient', 'ingredient_search_name_trgm'),
+    ('recipe', 'recipe_search_name_trgm'),
+)
+
+
+def fill_search_name(apps, schema_editor):
+    for model_name, _ in TRIGRAM_INDEXES:
+        model = apps.get_model('recipes', model_name)
+        objects = list(model.objects.only('id', 'name'))
+        for obj in objects:
+            obj.search_name = obj.name.casefold().replace('ё', 'е')
+        model.objects.bulk_update(objects, ['search_name'], batch_size=1000)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model_name, index_name in TRIGRAM_INDEXES:
+        schema_editor.add_index(
+            apps.get_model('recipes', model_name),
+            GinIndex(
+                fields=['search_name'],
+                name=index_name,
+                opclasses=['gin_trgm_ops'],
+            ),
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model_name, index_name in TRIGRAM_INDEXES:
+        schema_editor.remove_index(
+            apps.get_model('recipes', model_name),
+            GinIndex(
+                fields=['search_name'],
+                name=index_name,
+                opclasses=['gin_trgm_ops'],
+            ),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_shoppingcartversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='search_name',
+            field=models.CharField(default='', editable=False, max_length=200, verbose_name='Наименование для поиска'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='search_name',
+            field=models.CharField(default='', editable=False, max_length=200, verbose_name='Наименование для поиска'),
+        ),
+        migrations.RunPython(fill_search_name, migrations.RunPython.noop),
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 3.2.19 on 2026-10-18 16:43
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def fill_content_hashes(apps, schema_editor):
+    '''Хэши описаний и изображений существующих рецептов.
+
+    Повторы у одного автора (созданные в обход API) остаются без хэша,
+    чтобы не нарушать уникальные ограничения.
+    '''
+    Recipe = apps.get_model('recipes', 'Recipe')
+    seen = set()
+    recipes = list(Recipe.objects.order_by('id'))
+    for recipe in recipes:
+        text_hash = hashlib.sha256(recipe.text.encode()).hexdigest()
+        image_hash = None
+        try:
+            hasher = hashlib.sha256()
+            for chunk in recipe.image.chunks():
+                hasher.update(chunk)
+            recipe.image.close()
+            image_hash = hasher.hexdigest()
+        except (OSError, ValueError):
+            pass
+        for field, value in (('text_hash', text_hash),
+                             ('image_hash', image_hash)):
+            key = (recipe.author_id, field, value)
+            if value is not None and key not in seen:
+                seen.add(key)
+                setattr(recipe, field, value)
+    Recipe.objects.bulk_update(
+        recipes, ['text_hash', 'image_hash'], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_hash',
+            field=models.CharField(editable=False, max_length=64, null=True, verbose_name='Хэш изображения'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='text_hash',
+            field=models.CharField(editable=False, max_length=64, null=True, verbose_name='Хэш описания'),
+        ),
+        migrations.RunPython(fill_content_hashes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', 'name'], name='recipe_author_name_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipe',
+            constraint=models.UniqueConstraint(fields=('author', 'text_hash'), name='model_Recipe_text_constraints'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipe',
+            constraint=models.UniqueConstraint(fields=('author', 'image_hash'), name='model_Recipe_image_constraints'),
+        ),
+    ]
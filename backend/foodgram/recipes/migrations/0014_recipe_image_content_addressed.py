@@ -0,0 +1,20 @@
+# Generated by Django 3.2.19 on 2026-10-18 16:45
+
+from django.db import migrations, models
+import recipes.models
+import recipes.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_recipe_content_hashes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(db_index=True, storage=recipes.storage.ContentAddressedStorage(), upload_to=recipes.models.recipe_image_path, verbose_name='Изображение рецепта'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.19 on 2026-10-18 16:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_recipe_has_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingImageDeletion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Путь к файлу')),
+                ('image_hash', models.CharField(max_length=64, null=True, verbose_name='Хэш изображения')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Время постановки в очередь')),
+            ],
+            options={
+                'verbose_name': 'Изображение на удаление',
+                'verbose_name_plural': 'Изображения на удаление',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.19 on 2026-10-18 16:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0016_pendingimagedeletion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['image_hash'], name='recipe_image_hash_idx'),
+        ),
+    ]
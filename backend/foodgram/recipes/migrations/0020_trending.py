@@ -0,0 +1,60 @@
+# Generated by Django 3.2.19 on 2026-10-18 16:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+from django.db.models import OuterRef, Subquery
+
+
+def fill_created(apps, schema_editor):
+    '''Время существующих добавлений неизвестно: берется время
+    создания рецепта, чтобы старая активность не попала в популярное
+    сразу после миграции.
+    '''
+    Recipe = apps.get_model('recipes', 'Recipe')
+    date_created = Recipe.objects.filter(
+        pk=OuterRef('recipe_id')
+    ).values('date_created')
+    for model_name in ('Favorite', 'ShoppingCart'):
+        apps.get_model('recipes', model_name).objects.update(
+            created=Subquery(date_created)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0019_recipe_ordering_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending_score', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('score', models.FloatField(verbose_name='Оценка')),
+                ('updated', models.DateTimeField(verbose_name='Время расчета')),
+            ],
+            options={
+                'verbose_name': 'Оценка популярности',
+                'verbose_name_plural': 'Оценки популярности',
+            },
+        ),
+        migrations.AddField(
+            model_name='favorite',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Время добавления в избранное'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Время добавления в корзину'),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='trendingscore',
+            index=models.Index(fields=['-score', 'recipe'], name='trending_score_idx'),
+        ),
+        migrations.RunPython(fill_created, migrations.RunPython.noop),
+    ]
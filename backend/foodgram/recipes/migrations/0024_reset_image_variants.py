@@ -0,0 +1,25 @@
+# Generated by Django 3.2.19 on 2026-10-18 17:39
+
+from django.db import migrations
+
+
+def reset_image_variants(apps, schema_editor):
+    '''Варианты теперь называются только по хэшу изображения: прежние
+    файлы с расширением исходника не подходят, и рецепты ждут
+    повторной генерации командой generate_image_variants.
+    '''
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.filter(has_image_variants=True).update(
+        has_image_variants=False
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0023_dataversion'),
+    ]
+
+    operations = [
+        migrations.RunPython(reset_image_variants, migrations.RunPython.noop),
+    ]
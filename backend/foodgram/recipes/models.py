@@ -1,8 +1,14 @@
+import os
+
 from colorfield.fields import ColorField
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 
+from .hashing import get_file_hash, get_text_hash
+from .search import normalize_name
+from .storage import ContentAddressedStorage
 from .validators import validate_slug
 
 User = get_user_model()
@@ -54,6 +60,12 @@ class Ingredient(models.Model):
         max_length=200,
         verbose_name='Наименование ингредиента',
     )
+    search_name = models.CharField(
+        max_length=200,
+        editable=False,
+        default='',
+        verbose_name='Наименование для поиска',
+    )
     measurement_unit = models.ForeignKey(
         Measurement,
         on_delete=models.RESTRICT,
@@ -68,6 +80,62 @@ class Ingredient(models.Model):
     def __str__(self):
         return self.name[:25]
 
+    def save(self, *args, **kwargs):
+        self.search_name = normalize_name(self.name)
+        super().save(*args, **kwargs)
+
+
+def recipe_image_path(instance, filename):
+    '''Путь к изображению рецепта по хэшу его содержимого.'''
+    ext = os.path.splitext(filename)[1].lower()
+    image_hash = instance.image_hash
+    return f'recipes/images/{image_hash[:2]}/{image_hash}{ext}'
+
+
+class RecipeQuerySet(models.QuerySet):
+    '''Набор запросов к рецептам с признаками текущего пользователя.'''
+
+    def with_user_flags(self, user):
+        '''Добавляет к рецептам признаки is_favorited и is_in_shopping_cart
+        подзапросами EXISTS в основном запросе.
+        '''
+        if user.is_anonymous:
+            return self.annotate(
+                is_favorited=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+                is_in_shopping_cart=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+            )
+        return self.annotate(
+            is_favorited=models.Exists(
+                Favorite.objects.filter(
+                    user=user, recipe=models.OuterRef('pk')
+                )
+            ),
+            is_in_shopping_cart=models.Exists(
+                ShoppingCart.objects.filter(
+                    user=user, recipe=models.OuterRef('pk')
+                )
+            ),
+        )
+
+    def latest_per_author(self, limit):
+        '''Не более limit последних рецептов каждого автора из набора.
+
+        Рецепт отбирается, если входит в limit последних рецептов своего
+        автора. Коррелированный подзапрос с LIMIT обслуживается индексом
+        (author, date_created, id) и компилируется вместе с основным
+        запросом, поэтому пустой набор авторов дает пустой результат.
+        '''
+        latest = self.filter(
+            author=models.OuterRef('author')
+        ).order_by('-date_created', '-id').values('pk')[:limit]
+        return self.filter(
+            pk__in=models.Subquery(latest)
+        ).order_by('-date_created', '-id')
+
 
 class Recipe(models.Model):
     '''Модель рецептов.'''
@@ -88,17 +156,57 @@ class Recipe(models.Model):
         verbose_name='Ингредиенты рецепта',
     )
     image = models.ImageField(
-        upload_to='recipes/images/',
+        upload_to=recipe_image_path,
+        storage=ContentAddressedStorage(),
+        db_index=True,
         verbose_name='Изображение рецепта',
     )
     name = models.CharField(
         max_length=200,
         verbose_name='Наименование рецепта',
     )
+    search_name = models.CharField(
+        max_length=200,
+        editable=False,
+        default='',
+        verbose_name='Наименование для поиска',
+    )
     text = models.TextField(
         'Описание рецепта',
         help_text='Введите описание рецепта',
     )
+    favorites_count = models.PositiveIntegerField(
+        'Кол-во добавлений в избранное',
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'Кол-во добавлений в корзину',
+        default=0,
+        editable=False,
+    )
+    has_image_variants = models.BooleanField(
+        'Уменьшенные изображения готовы',
+        default=False,
+        editable=False,
+    )
+    text_hash = models.CharField(
+        max_length=64,
+        null=True,
+        editable=False,
+        verbose_name='Хэш описания',
+    )
+    image_hash = models.CharField(
+        max_length=64,
+        null=True,
+        editable=False,
+        verbose_name='Хэш изображения',
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор названия и описания',
+    )
     cooking_time = models.PositiveSmallIntegerField(
         validators=[MinValueValidator(1), MaxValueValidator(2880)],
         verbose_name='Время приготовления в мин',
@@ -113,13 +221,59 @@ class Recipe(models.Model):
         auto_now=True
     )
 
+    objects = RecipeQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['date_created', 'id'],
+                name='recipe_date_created_id_idx'
+            ),
+            models.Index(
+                fields=['author', 'name'],
+                name='recipe_author_name_idx'
+            ),
+            models.Index(
+                fields=['image_hash'],
+                name='recipe_image_hash_idx'
+            ),
+            models.Index(
+                fields=['favorites_count', 'id'],
+                name='recipe_favorites_count_id_idx'
+            ),
+            models.Index(
+                fields=['cooking_time', 'id'],
+                name='recipe_cooking_time_id_idx'
+            ),
+            models.Index(
+                fields=['author', 'date_created', 'id'],
+                name='recipe_author_date_id_idx'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['author', 'text_hash'],
+                name='model_Recipe_text_constraints'
+            ),
+            models.UniqueConstraint(
+                fields=['author', 'image_hash'],
+                name='model_Recipe_image_constraints'
+            ),
+        ]
 
     def __str__(self):
         return self.name[:20]
 
+    def save(self, *args, **kwargs):
+        self.search_name = normalize_name(self.name)
+        self.text_hash = get_text_hash(self.text)
+        if self.image and not self.image._committed:
+            self.image_hash = get_file_hash(self.image)
+            self.has_image_variants = False
+        super().save(*args, **kwargs)
+
 
 class IngredientRecipe(models.Model):
     '''Промежуточная модель для связи MtoM для Recipe и Ingredient.'''
@@ -196,6 +350,11 @@ class ShoppingCart(models.Model):
         related_name='in_shopping_cart',
         verbose_name='Рецепт, добавленный в корзину',
     )
+    created = models.DateTimeField(
+        'Время добавления в корзину',
+        auto_now_add=True,
+        db_index=True,
+    )
 
     class Meta:
         verbose_name = 'Рецепты в корзине'
@@ -222,6 +381,11 @@ class Favorite(models.Model):
         related_name='favorited',
         verbose_name='Рецепт, добавленный в избранное',
     )
+    created = models.DateTimeField(
+        'Время добавления в избранное',
+        auto_now_add=True,
+        db_index=True,
+    )
 
     class Meta:
         verbose_name = 'Избранные рецепты'
@@ -232,3 +396,179 @@ class Favorite(models.Model):
                 name='model_Favorite_constraints'
             )
         ]
+
+
+class ShoppingCartVersion(models.Model):
+    '''Версия корзины покупок пользователя.
+
+    Увеличивается при любом изменении состава корзины или ингредиентов
+    рецептов в ней и входит в ключ кэша готовых списков покупок.
+    '''
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='shopping_cart_version',
+        verbose_name='Покупатель',
+    )
+    version = models.PositiveIntegerField(
+        'Версия корзины',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Версия корзины'
+        verbose_name_plural = 'Версии корзин'
+
+
+class PendingImageDeletion(models.Model):
+    '''Очередь файлов изображений на удаление из хранилища.
+
+    Записи добавляются в той же транзакции, что и удаление рецептов,
+    а файлы удаляются пачками в фоне или командой
+    process_image_deletions - если на них больше не ссылается ни один
+    рецепт.
+    '''
+    name = models.CharField(
+        'Путь к файлу',
+        max_length=255,
+        unique=True,
+    )
+    image_hash = models.CharField(
+        'Хэш изображения',
+        max_length=64,
+        null=True,
+    )
+    created = models.DateTimeField(
+        'Время постановки в очередь',
+        auto_now_add=True,
+    )
+
+    class Meta:
+        verbose_name = 'Изображение на удаление'
+        verbose_name_plural = 'Изображения на удаление'
+
+
+class DataVersion(models.Model):
+    '''Номер версии набора данных, общий для всех процессов.
+
+    Увеличивается при изменении данных, из которых процессы строят
+    свои кэши в памяти (например, индекс ингредиентов); процесс,
+    увидевший новую версию, перестраивает кэш.
+    '''
+    name = models.CharField(
+        'Набор данных',
+        max_length=50,
+        primary_key=True,
+    )
+    version = models.PositiveIntegerField(
+        'Версия',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Версия данных'
+        verbose_name_plural = 'Версии данных'
+
+
+class TrendingScore(models.Model):
+    '''Затухающая во времени оценка недавней активности по рецепту.
+
+    Заполняется командой compute_trending_scores; по ней строится
+    выдача популярных сейчас рецептов.
+    '''
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending_score',
+        verbose_name='Рецепт',
+    )
+    score = models.FloatField('Оценка')
+    updated = models.DateTimeField('Время расчета')
+
+    class Meta:
+        verbose_name = 'Оценка популярности'
+        verbose_name_plural = 'Оценки популярности'
+        indexes = [
+            models.Index(
+                fields=['-score', 'recipe'],
+                name='trending_score_idx'
+            ),
+        ]
+
+
+class FeedEntry(models.Model):
+    '''Запись ленты подписок: рецепт автора, на которого подписан
+    пользователь.
+
+    Время создания рецепта скопировано в запись, чтобы страница ленты
+    читалась одним проходом по индексу (user, date_created, recipe).
+    '''
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт',
+    )
+    date_created = models.DateTimeField('Время создания рецепта')
+
+    class Meta:
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
+        indexes = [
+            models.Index(
+                fields=['user', '-date_created', '-recipe'],
+                name='feed_entry_user_date_idx'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='model_FeedEntry_constraints'
+            )
+        ]
+
+
+class SimilarRecipe(models.Model):
+    '''Похожий рецепт: близость составов по коэффициенту Жаккара.
+
+    Для каждого рецепта хранится не больше SIMILAR_RECIPES_LIMIT
+    соседей; таблицу строит команда build_similar_recipes и обновляют
+    изменения состава рецептов.
+    '''
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_entries',
+        verbose_name='Рецепт',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похожий рецепт',
+    )
+    score = models.FloatField('Коэффициент Жаккара')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        indexes = [
+            models.Index(
+                fields=['recipe', '-score'],
+                name='similar_recipe_score_idx'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'],
+                name='model_SimilarRecipe_constraints'
+            )
+        ]
@@ -0,0 +1,97 @@
+from collections import defaultdict
+
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            TrigramSimilarity)
+from django.db import connections
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast
+
+
+def normalize_name(name):
+    '''Приведение названия к виду для поиска: без регистра, ё -> е.'''
+    return name.casefold().replace('ё', 'е')
+
+
+def is_postgresql(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def as_double(rank):
+    '''Ранг в double precision.
+
+    SearchRank и similarity() возвращают real; значение ранга попадает
+    в позицию курсора и сравнивается обратно как double, поэтому
+    без приведения записи с равным рангом не находятся по равенству.
+    '''
+    return Cast(rank, FloatField())
+
+
+def rank_by_position(value):
+    '''Ранг совпадения: полное > по началу названия > по подстроке.'''
+    return Case(
+        When(search_name=value, then=Value(2.0)),
+        When(search_name__startswith=value, then=Value(1.0)),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def filter_name_contains(queryset, value):
+    '''Поиск по подстроке в нормализованном названии.
+
+    В PostgreSQL условие LIKE '%...%' обслуживается триграммным
+    GIN-индексом по search_name.
+    '''
+    value = normalize_name(value.strip())
+    return queryset.filter(search_name__contains=value).annotate(
+        search_rank=rank_by_position(value)
+    )
+
+
+def filter_name_similar(queryset, value):
+    '''Нечеткий поиск по названию с ранжированием по схожести.
+
+    В PostgreSQL используется оператор pg_trgm % и similarity();
+    в остальных БД (SQLite в тестах) - поиск по подстроке.
+    '''
+    if not is_postgresql(queryset):
+        return filter_name_contains(queryset, value)
+    value = normalize_name(value.strip())
+    return queryset.filter(search_name__trigram_similar=value).annotate(
+        search_rank=as_double(TrigramSimilarity('search_name', value))
+    )
+
+
+def filter_full_text(queryset, value):
+    '''Полнотекстовый поиск рецептов по названию и описанию.
+
+    В PostgreSQL - по поддерживаемому триггером столбцу search_vector
+    (русская морфология, GIN-индекс) с ранжированием ts_rank; название
+    весит больше описания. В остальных БД (SQLite в тестах) - вхождение
+    всех слов запроса в нормализованные название или описание,
+    совпадения в названии ранжируются выше.
+    '''
+    if is_postgresql(queryset):
+        query = SearchQuery(value, config='russian', search_type='websearch')
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=as_double(SearchRank(F('search_vector'), query))
+        )
+
+    words = normalize_name(value).split()
+    if not words:
+        return queryset
+    # LIKE в SQLite не приводит к одному регистру кириллицу и не знает
+    # про ё, поэтому сравнение идет по нормализованному тексту в Python.
+    ranks = defaultdict(list)
+    for pk, name, text in queryset.values_list('pk', 'name', 'text'):
+        name, text = normalize_name(name), normalize_name(text)
+        if all(word in name or word in text for word in words):
+            ranks[sum(word in name for word in words)].append(pk)
+    return queryset.filter(
+        pk__in=[pk for pks in ranks.values() for pk in pks]
+    ).annotate(search_rank=Case(
+        *(When(pk__in=pks, then=Value(float(rank)))
+          for rank, pks in ranks.items()),
+        default=Value(0.0),
+        output_field=FloatField(),
+    ))
@@ -1,17 +1,31 @@
 import base64
+import binascii
+from collections import Counter
 
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.db.models import Q
 from rest_framework import serializers
-from rest_framework.validators import UniqueTogetherValidator
 
 from users.serializers import CustomUserSerializer
 
+from .hashing import get_file_hash, get_text_hash
+from .images import get_variant_urls
 from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
                      ShoppingCart, Tag, TagRecipe)
+from .shopping_list.cache import bump_cart_versions_for_recipes
+from .similarity import schedule_similar_update
+from .validators import validate_image_header, validate_image_size
 
 User = get_user_model()
 
+DUPLICATE_RECIPE_CONSTRAINTS = (
+    'model_Recipe_text_constraints',
+    'model_Recipe_image_constraints',
+)
+
 
 class TagSerializer(serializers.ModelSerializer):
     '''Получение списка тегов или отдельного тега'''
@@ -49,12 +63,80 @@ class GetIngredientRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
+def get_objects_in_bulk(queryset, pk_list):
+    '''Объекты по списку id одним запросом; при отсутствии хотя бы
+    одного - ошибка валидации со списком всех ненайденных id.
+    '''
+    objects = queryset.in_bulk(set(pk_list))
+    missing = sorted({pk for pk in pk_list if pk not in objects})
+    if missing:
+        raise serializers.ValidationError(
+            f'Объекты с id {", ".join(map(str, missing))} не существуют.'
+        )
+    return objects
+
+
+def is_duplicate_recipe_error(error):
+    '''Нарушена ли ошибкой уникальность описания или изображения рецепта.
+
+    PostgreSQL называет в сообщении ограничение, SQLite - его столбцы.
+    '''
+    message = str(error)
+    table = Recipe._meta.db_table
+    for constraint in Recipe._meta.constraints:
+        if constraint.name not in DUPLICATE_RECIPE_CONSTRAINTS:
+            continue
+        columns = ', '.join(
+            f'{table}.{Recipe._meta.get_field(field).column}'
+            for field in constraint.fields
+        )
+        if constraint.name in message or columns in message:
+            return True
+    return False
+
+
+class BulkPrimaryKeyRelatedField(serializers.ManyRelatedField):
+    '''Список id связанных объектов, проверяемый одним запросом к БД.'''
+    default_error_messages = {
+        'incorrect_type': 'Некорректный тип id. Ожидалось число, '
+                          'получено {data_type}.',
+        'duplicate': 'Id {pk_list} указаны несколько раз.',
+    }
+
+    def __init__(self, queryset, **kwargs):
+        self.queryset = queryset
+        super().__init__(
+            child_relation=serializers.PrimaryKeyRelatedField(
+                queryset=queryset
+            ),
+            **kwargs
+        )
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        pk_list = []
+        for item in data:
+            if isinstance(item, bool) or not isinstance(item, (int, str)):
+                self.fail('incorrect_type', data_type=type(item).__name__)
+            try:
+                pk_list.append(int(item))
+            except ValueError:
+                self.fail('incorrect_type', data_type=type(item).__name__)
+        duplicates = sorted(
+            pk for pk, count in Counter(pk_list).items() if count > 1
+        )
+        if duplicates:
+            self.fail('duplicate', pk_list=', '.join(map(str, duplicates)))
+        objects = get_objects_in_bulk(self.queryset.all(), pk_list)
+        return [objects[pk] for pk in pk_list]
+
+
 class AddIngredientRecipeSerializer(serializers.ModelSerializer):
     '''Описание ингредиентов при создании рецепта'''
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(),
-        source='ingredient',
-    )
+    id = serializers.IntegerField(source='ingredient')
     recipe = serializers.HiddenField(default=None)
 
     class Meta:
@@ -64,23 +146,32 @@ class AddIngredientRecipeSerializer(serializers.ModelSerializer):
 
 class Base64ImageField(serializers.ImageField):
     '''Кастомный тип поля для декодирования строки в
-    файл изображения на сервере.
+    файл изображения на сервере. Принимает также обычный файл
+    из multipart-запроса; оба варианта проходят одну проверку
+    размера и заголовка изображения до его полного декодирования.
     '''
     def to_internal_value(self, data):
-        if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+        try:
+            if isinstance(data, str) and data.startswith('data:image'):
+                format, imgstr = data.split(';base64,')
+                ext = format.split('/')[-1]
+                validate_image_size(len(imgstr) * 3 // 4)
+                data = ContentFile(
+                    base64.b64decode(imgstr), name='temp.' + ext
+                )
+            if hasattr(data, 'size') and hasattr(data, 'seek'):
+                validate_image_header(data)
+        except DjangoValidationError as error:
+            raise serializers.ValidationError(error.messages)
+        except (ValueError, binascii.Error):
+            self.fail('invalid_image')
         return super().to_internal_value(data)
 
 
 class AddRecipeSerializer(serializers.ModelSerializer):
     '''Сериализатор для создания нового рецепта'''
     ingredients = AddIngredientRecipeSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=Tag.objects.all(),
-    )
+    tags = BulkPrimaryKeyRelatedField(queryset=Tag.objects.all())
     image = Base64ImageField()
     author = serializers.HiddenField(
         default=serializers.CurrentUserDefault(),
@@ -92,23 +183,50 @@ class AddRecipeSerializer(serializers.ModelSerializer):
             'ingredients', 'tags', 'image',
             'name', 'text', 'cooking_time', 'author'
         )
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Recipe.objects.all(),
-                fields=('name', 'author'),
-                message='У Вас может быть только один рецепт с таким названием'
+
+    unique_messages = {
+        'name': 'У Вас может быть только один рецепт с таким названием',
+        'text_hash': 'У Вас уже есть рецепт с таким описанием',
+        'image_hash': 'У Вас уже есть рецепт с таким изображением',
+    }
+
+    def validate(self, attrs):
+        '''Уникальность названия, описания и изображения у автора -
+        одним запросом по названию и хэшам содержимого.
+        '''
+        instance = self.instance
+        author = instance.author if instance else attrs['author']
+        values = {
+            'name': attrs.get('name', getattr(instance, 'name', None)),
+            'text_hash': (
+                get_text_hash(attrs['text']) if 'text' in attrs
+                else getattr(instance, 'text_hash', None)
             ),
-            UniqueTogetherValidator(
-                queryset=Recipe.objects.all(),
-                fields=('text', 'author'),
-                message='У Вас уже есть рецепт с таким описанием'
+            'image_hash': (
+                get_file_hash(attrs['image']) if 'image' in attrs
+                else getattr(instance, 'image_hash', None)
             ),
-            UniqueTogetherValidator(
-                queryset=Recipe.objects.all(),
-                fields=('image', 'author'),
-                message='У Вас уже есть рецепт с таким изображением'
-            )
+        }
+        lookups = Q()
+        for field, value in values.items():
+            if value is not None:
+                lookups |= Q(**{field: value})
+        conflicts = Recipe.objects.filter(
+            lookups, author=author
+        ).values_list(*values)
+        if instance is not None:
+            conflicts = conflicts.exclude(pk=instance.pk)
+        errors = [
+            self.unique_messages[field]
+            for conflict in conflicts
+            for field, value in zip(values, conflict)
+            if value is not None and value == values[field]
         ]
+        if errors:
+            raise serializers.ValidationError(
+                {'non_field_errors': list(dict.fromkeys(errors))}
+            )
+        return attrs
 
     def validate_ingredients(self, value):
         if len(value) == 0:
@@ -122,43 +240,118 @@ class AddRecipeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'В рецепте ингредиенты не должны повторяться.'
             )
+        ingredients = get_objects_in_bulk(
+            Ingredient.objects.all(), value_id_set
+        )
+        for element in value:
+            element['ingredient'] = ingredients[element['ingredient']]
         return value
 
     def create_objects_tagrecipe(self, recipe, tags):
-        for tag in tags:
-            TagRecipe.objects.create(
-                tag=tag,
-                recipe=recipe,
-            )
+        TagRecipe.objects.bulk_create(
+            TagRecipe(tag=tag, recipe=recipe) for tag in tags
+        )
 
     def create_objects_ingredientrecipe(self, recipe, ingredients):
-        for element in ingredients:
-            IngredientRecipe.objects.create(
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(
                 ingredient=element.get('ingredient'),
                 recipe=recipe,
                 amount=element.get('amount'),
             )
+            for element in ingredients
+        )
+
+    def update_objects_tagrecipe(self, recipe, tags):
+        '''Удаляет снятые и добавляет новые теги, остальные не трогает.'''
+        new_tags = {tag.id: tag for tag in tags}
+        old_tag_ids = set(
+            TagRecipe.objects.filter(recipe=recipe).values_list(
+                'tag_id', flat=True
+            )
+        )
+        removed = old_tag_ids - new_tags.keys()
+        if removed:
+            TagRecipe.objects.filter(
+                recipe=recipe, tag_id__in=removed
+            ).delete()
+        self.create_objects_tagrecipe(
+            recipe,
+            [tag for tag_id, tag in new_tags.items()
+             if tag_id not in old_tag_ids],
+        )
 
+    def update_objects_ingredientrecipe(self, recipe, ingredients):
+        '''Применяет к составу рецепта только разницу со старым составом.
+
+        Возвращает True, если состав рецепта изменился.
+        '''
+        new_amounts = {
+            element.get('ingredient').id: element for element in ingredients
+        }
+        old_objects = {
+            obj.ingredient_id: obj
+            for obj in IngredientRecipe.objects.filter(recipe=recipe)
+        }
+        removed = old_objects.keys() - new_amounts.keys()
+        added = [
+            element for ingredient_id, element in new_amounts.items()
+            if ingredient_id not in old_objects
+        ]
+        changed = []
+        for ingredient_id, obj in old_objects.items():
+            element = new_amounts.get(ingredient_id)
+            if element is not None and obj.amount != element.get('amount'):
+                obj.amount = element.get('amount')
+                changed.append(obj)
+
+        if removed:
+            IngredientRecipe.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+        if changed:
+            IngredientRecipe.objects.bulk_update(changed, ['amount'])
+        self.create_objects_ingredientrecipe(recipe, added)
+        return bool(removed or added or changed)
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(**validated_data)
         self.create_objects_tagrecipe(recipe, tags)
         self.create_objects_ingredientrecipe(recipe, ingredients)
+        schedule_similar_update(recipe.id)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
 
-        IngredientRecipe.objects.filter(recipe=instance).delete()
-        TagRecipe.objects.filter(recipe=instance).delete()
-
-        self.create_objects_tagrecipe(instance, tags)
-        self.create_objects_ingredientrecipe(instance, ingredients)
+        self.update_objects_tagrecipe(instance, tags)
+        if self.update_objects_ingredientrecipe(instance, ingredients):
+            # bulk-операции не вызывают сигналы, версии корзин и
+            # похожие рецепты - вручную
+            bump_cart_versions_for_recipes([instance.id])
+            schedule_similar_update(instance.id)
 
         return super().update(instance, validated_data)
 
+    def save(self, **kwargs):
+        '''Гонку двух одинаковых запросов, прошедших validate, ловит
+        уникальность описания и изображения в БД - такое нарушение
+        возвращается как ошибка валидации, остальные пробрасываются.
+        '''
+        try:
+            return super().save(**kwargs)
+        except IntegrityError as error:
+            if not is_duplicate_recipe_error(error):
+                raise
+            raise serializers.ValidationError(
+                {'non_field_errors': ['У Вас уже есть такой рецепт']}
+            )
+
     def to_representation(self, instance):
         context = {'request': self.context.get('request')}
         return GetRecipeSerializer(instance, context=context).data
@@ -178,22 +371,30 @@ class GetRecipeSerializer(serializers.ModelSerializer):
     )
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
+    image_variants = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients',
-            'is_favorited', 'is_in_shopping_cart',
-            'name', 'image', 'text', 'cooking_time',
+            'is_favorited', 'is_in_shopping_cart', 'favorites_count',
+            'name', 'image', 'image_variants', 'text', 'cooking_time',
         )
 
+    def get_image_variants(self, obj):
+        return get_variant_urls(obj, self.context.get('request'))
+
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context['request'].user
         if user.is_anonymous:
             return False
         return obj.favorited.filter(user=user).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context['request'].user
         if user.is_anonymous:
             return False
@@ -231,9 +432,14 @@ class FavoriteSerializer(serializers.ModelSerializer):
 
 class GetRecipeShortSerializer(serializers.ModelSerializer):
     '''Сериализатор для вывода сокращенной информации о рецепте.'''
+    image_variants = serializers.SerializerMethodField(read_only=True)
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
+
+    def get_image_variants(self, obj):
+        return get_variant_urls(obj, self.context.get('request'))
 
 
 class ShoppingCartSerializer(FavoriteSerializer):
@@ -0,0 +1,26 @@
+from django.db.models import F, Sum
+
+from ..models import IngredientRecipe
+
+
+def get_shopping_list(user):
+    '''Сводный список покупок по рецептам из корзины пользователя.
+
+    Один проход по IngredientRecipe с группировкой по ингредиенту и
+    единице измерения. Каждая строка - словарь с ключами ingredient_id,
+    name, measurement_unit и total_amount.
+    '''
+    return IngredientRecipe.objects.filter(
+        recipe__in_shopping_cart__user=user
+    ).values(
+        'ingredient_id',
+        name=F('ingredient__name'),
+        measurement_unit=F('ingredient__measurement_unit__name'),
+    ).annotate(
+        total_amount=Sum('amount'),
+    ).order_by('name', 'measurement_unit')
+
+
+def format_row(row):
+    '''Строка списка покупок: "название (ед.изм.) - количество".'''
+    return f'{row["name"]} ({row["measurement_unit"]}) - {row["total_amount"]}'
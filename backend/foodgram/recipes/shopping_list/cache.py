@@ -0,0 +1,106 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import F
+
+from ..ingredient_index import VERSION_NAME as INGREDIENTS_VERSION
+from ..models import ShoppingCart, ShoppingCartVersion
+from ..versions import get_version
+
+CACHE_MAX_BYTES = getattr(
+    settings, 'SHOPPING_LIST_CACHE_MAX_BYTES', 32 * 1024 * 1024
+)
+
+
+class ArtifactCache:
+    '''LRU-кэш готовых списков покупок, ограниченный суммарным размером.
+
+    Ключ содержит версию корзины, поэтому устаревшие документы не
+    инвалидируются явно, а вытесняются по мере заполнения кэша.
+    '''
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            content = self._items.get(key)
+            if content is not None:
+                self._items.move_to_end(key)
+            return content
+
+    def set(self, key, content):
+        if len(content) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = content
+            self.size += len(content)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+
+artifact_cache = ArtifactCache(CACHE_MAX_BYTES)
+
+
+def get_cart_version(user):
+    '''Текущая версия корзины пользователя.'''
+    cart_version, _ = ShoppingCartVersion.objects.get_or_create(user=user)
+    return cart_version.version
+
+
+def bump_cart_version(user_id):
+    '''Увеличивает версию корзины пользователя.'''
+    ShoppingCartVersion.objects.filter(user_id=user_id).update(
+        version=F('version') + 1
+    )
+
+
+def bump_cart_versions_for_recipes(recipe_ids):
+    '''Увеличивает версии корзин, в которых лежат рецепты recipe_ids.'''
+    ShoppingCartVersion.objects.filter(
+        user__in=ShoppingCart.objects.filter(
+            recipe__in=recipe_ids
+        ).values('user')
+    ).update(version=F('version') + 1)
+
+
+def get_document_key(user, renderer, cur_date):
+    '''Ключ кэша документа: пользователь, версия корзины, версия
+    справочника ингредиентов, формат, дата.
+
+    Переименование ингредиента или единицы измерения меняет общую
+    версию справочника, и списки всех пользователей строятся заново.
+    '''
+    return (
+        user.pk, get_cart_version(user), get_version(INGREDIENTS_VERSION),
+        renderer.format, cur_date,
+    )
+
+
+def get_etag(key):
+    user_id, version, ingredients_version, format, cur_date = key
+    return (
+        f'"{user_id}-{version}.{ingredients_version}-{format}-'
+        f'{cur_date:%Y%m%d}"'
+    )
+
+
+def get_or_render(key, render):
+    '''Документ из кэша или результат render(), сохраненный в кэш.'''
+    content = artifact_cache.get(key)
+    if content is None:
+        content = b''.join(render())
+        artifact_cache.set(key, content)
+    return content
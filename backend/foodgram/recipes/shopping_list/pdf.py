@@ -0,0 +1,73 @@
+import io
+import os
+from functools import lru_cache
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from .aggregation import format_row
+
+FONT_NAME = 'DejaVuSerif'
+FONT_PATH = os.path.join(settings.BASE_DIR, 'data', 'DejaVuSerif.ttf')
+CHUNK_SIZE = 64 * 1024
+
+
+@lru_cache(maxsize=None)
+def register_fonts():
+    '''Регистрация шрифтов ReportLab - один раз на процесс.'''
+    pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_PATH))
+
+
+class ShoppingListPDFRenderer:
+    '''Формирование списка покупок в PDF с разбивкой на страницы.'''
+    page_size = A4
+    left = 20
+    top = 730
+    bottom = 40
+    line_height = 20
+
+    def __init__(self, title):
+        self.title = title
+
+    def draw_header(self, p):
+        p.setFont(FONT_NAME, 15, leading=None)
+        p.setFillColorRGB(0.29296875, 0.453125, 0.609375)
+        p.drawString(260, 800, 'Foodgram')
+        p.line(0, 780, 1000, 780)
+        p.line(0, 778, 1000, 778)
+        p.setFont(FONT_NAME, 12, leading=None)
+
+    def render(self, rows):
+        '''Возвращает буфер с готовым PDF-документом.'''
+        register_fonts()
+        buffer = io.BytesIO()
+        p = canvas.Canvas(buffer, pagesize=self.page_size)
+        p.setTitle(self.title)
+        self.draw_header(p)
+        y = self.top
+        for row in rows:
+            if y < self.bottom:
+                p.showPage()
+                self.draw_header(p)
+                y = self.top
+            p.drawString(self.left, y, format_row(row))
+            y -= self.line_height
+        p.showPage()
+        p.save()
+        return buffer
+
+    def stream(self, rows, chunk_size=CHUNK_SIZE):
+        '''Рендерит документ и возвращает итератор по его частям
+        для StreamingHttpResponse, не копируя буфер целиком.
+        '''
+        buffer = self.render(rows)
+        buffer.seek(0)
+        return self._iter_chunks(buffer, chunk_size)
+
+    @staticmethod
+    def _iter_chunks(buffer, chunk_size):
+        with buffer:
+            yield from iter(lambda: buffer.read(chunk_size), b'')
@@ -0,0 +1,138 @@
+import csv
+import io
+import json
+from abc import ABC, abstractmethod
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from .aggregation import format_row
+from .pdf import CHUNK_SIZE, ShoppingListPDFRenderer
+
+
+def iter_chunks(content):
+    '''Отдает готовый документ частями по CHUNK_SIZE байт.'''
+    view = memoryview(content)
+    for start in range(0, len(view), CHUNK_SIZE):
+        yield view[start:start + CHUNK_SIZE]
+
+
+class ShoppingListRenderer(ABC, BaseRenderer):
+    '''Базовый формат выгрузки списка покупок.
+
+    Выбирается согласованием содержимого DRF (заголовок Accept или
+    параметр ?format=) и отдает список частями для StreamingHttpResponse.
+    Ответы с ошибками по-прежнему отдаются в JSON.
+    '''
+    charset = 'utf-8'
+    disposition = 'attachment'
+
+    @abstractmethod
+    def stream(self, rows, title):
+        '''Итератор по частям документа в байтах.'''
+
+    def get_content_type(self):
+        if self.charset:
+            return f'{self.media_type}; charset={self.charset}'
+        return self.media_type
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = JSONRenderer.media_type
+        return JSONRenderer().render(data)
+
+    def _batched(self, lines):
+        '''Склеивает строки в части по CHUNK_SIZE байт.'''
+        chunk = []
+        size = 0
+        for line in lines:
+            line = line.encode(self.charset)
+            chunk.append(line)
+            size += len(line)
+            if size >= CHUNK_SIZE:
+                yield b''.join(chunk)
+                chunk = []
+                size = 0
+        if chunk:
+            yield b''.join(chunk)
+
+
+class PDFShoppingListRenderer(ShoppingListRenderer):
+    '''Список покупок для печати.'''
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    disposition = 'inline'
+
+    def stream(self, rows, title):
+        return ShoppingListPDFRenderer(title=title).stream(rows)
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    '''Список покупок в CSV: ингредиент, ед.измерения, количество.'''
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, rows, title):
+        return self._batched(self._lines(rows))
+
+    @staticmethod
+    def _lines(rows):
+        line = io.StringIO()
+        writer = csv.writer(line)
+        writer.writerow(('name', 'measurement_unit', 'amount'))
+        for row in rows:
+            writer.writerow(
+                (row['name'], row['measurement_unit'], row['total_amount'])
+            )
+            yield line.getvalue()
+            line.seek(0)
+            line.truncate()
+        yield line.getvalue()
+
+
+class TextShoppingListRenderer(ShoppingListRenderer):
+    '''Список покупок простым текстом, одна позиция на строку.'''
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, rows, title):
+        lines = (f'{format_row(row)}\n' for row in rows)
+        return self._batched(self._with_title(title, lines))
+
+    @staticmethod
+    def _with_title(title, lines):
+        yield f'{title}\n\n'
+        yield from lines
+
+
+class JSONShoppingListRenderer(ShoppingListRenderer):
+    '''Список покупок в JSON: массив объектов name/measurement_unit/amount.'''
+    media_type = 'application/json'
+    format = 'json'
+
+    def stream(self, rows, title):
+        return self._batched(self._lines(rows))
+
+    @staticmethod
+    def _lines(rows):
+        separator = '['
+        for row in rows:
+            yield separator + json.dumps(
+                {
+                    'name': row['name'],
+                    'measurement_unit': row['measurement_unit'],
+                    'amount': row['total_amount'],
+                },
+                ensure_ascii=False,
+            )
+            separator = ','
+        yield '[]' if separator == '[' else ']'
+
+
+SHOPPING_LIST_RENDERERS = (
+    PDFShoppingListRenderer,
+    CSVShoppingListRenderer,
+    TextShoppingListRenderer,
+    JSONShoppingListRenderer,
+)
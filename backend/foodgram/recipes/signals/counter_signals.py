@@ -0,0 +1,52 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import Follow
+
+from ..counters import User, change_counter
+from ..models import Favorite, Recipe, ShoppingCart
+
+
+def get_delta(created):
+    """+1 при создании записи, -1 при удалении (post_delete не передает
+    created), None при обычном сохранении.
+    """
+    if created is None:
+        return -1
+    return 1 if created else None
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def favorite_changed(sender, instance, created=None, **kwargs):
+    """Счетчик добавлений рецепта в избранное."""
+    delta = get_delta(created)
+    if delta:
+        change_counter(Recipe, instance.recipe_id, 'favorites_count', delta)
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_changed(sender, instance, created=None, **kwargs):
+    """Счетчик добавлений рецепта в корзину."""
+    delta = get_delta(created)
+    if delta:
+        change_counter(Recipe, instance.recipe_id, 'in_carts_count', delta)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance, created=None, **kwargs):
+    """Счетчик рецептов автора."""
+    delta = get_delta(created)
+    if delta:
+        change_counter(User, instance.author_id, 'recipes_count', delta)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed(sender, instance, created=None, **kwargs):
+    """Счетчик подписчиков автора."""
+    delta = get_delta(created)
+    if delta:
+        change_counter(User, instance.author_id, 'followers_count', delta)
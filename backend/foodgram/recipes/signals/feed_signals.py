@@ -0,0 +1,28 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import Follow
+
+from ..background import schedule
+from ..feed import backfill, fan_out, remove_author
+from ..models import Recipe
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, *args, **kwargs):
+    """Рассылка нового рецепта по лентам подписчиков в фоне."""
+    if created:
+        schedule(fan_out, instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, *args, **kwargs):
+    """Заполнение ленты рецептами нового автора подписки в фоне."""
+    if created:
+        schedule(backfill, instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, *args, **kwargs):
+    """Удаление рецептов автора из ленты при отписке."""
+    remove_author(instance.user_id, instance.author_id)
@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from ..ingredient_index import ingredient_index
+from ..models import Ingredient, Measurement
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Measurement)
+@receiver(post_delete, sender=Measurement)
+def ingredients_changed(sender, instance, *args, **kwargs):
+    """Перестроение индекса автодополнения при изменении ингредиентов."""
+    ingredient_index.invalidate()
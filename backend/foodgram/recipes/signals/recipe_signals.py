@@ -1,10 +1,43 @@
-from django.db.models.signals import post_delete
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
+from ..images import queue_image_deletion, schedule_variants
 from ..models import Recipe
 
 
+@receiver(post_save, sender=Recipe)
+def post_save_image_variants(sender, instance, *args, **kwargs):
+    """Фоновая генерация уменьшенных изображений для нового изображения."""
+    if instance.image and instance.image_hash and (
+        not instance.has_image_variants
+    ):
+        schedule_variants(instance)
+
+
 @receiver(post_delete, sender=Recipe)
 def post_save_image(sender, instance, *args, **kwargs):
-    """Удаление картинки блюда из хранилища при удалении рецепта."""
-    instance.image.delete(save=False)
+    """Отложенное удаление картинки блюда и ее вариантов из хранилища
+    после коммита удаления рецепта.
+    """
+    if instance.image.name:
+        queue_image_deletion(instance.image.name, instance.image_hash)
+
+
+@receiver(pre_save, sender=Recipe)
+def pre_save_replaced_image(sender, instance, *args, **kwargs):
+    """Запоминает прежнюю картинку рецепта при загрузке новой."""
+    instance._replaced_image = None
+    if instance.pk and instance.image and not instance.image._committed:
+        instance._replaced_image = Recipe.objects.filter(
+            pk=instance.pk
+        ).values_list('image', 'image_hash').first()
+
+
+@receiver(post_save, sender=Recipe)
+def post_save_replaced_image(sender, instance, *args, **kwargs):
+    """Отложенное удаление прежней картинки после замены изображения
+    (та же очередь и тот же льготный период, что и при удалении).
+    """
+    replaced = getattr(instance, '_replaced_image', None)
+    if replaced and replaced[0] and replaced[0] != instance.image.name:
+        queue_image_deletion(*replaced)
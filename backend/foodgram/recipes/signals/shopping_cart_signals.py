@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from ..models import IngredientRecipe, ShoppingCart
+from ..shopping_list.cache import (bump_cart_version,
+                                   bump_cart_versions_for_recipes)
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_changed(sender, instance, *args, **kwargs):
+    """Новая версия корзины при добавлении/удалении рецепта."""
+    bump_cart_version(instance.user_id)
+
+
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+def ingredient_recipe_changed(sender, instance, *args, **kwargs):
+    """Новая версия корзин, содержащих рецепт с измененным составом."""
+    bump_cart_versions_for_recipes([instance.recipe_id])
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from ..models import IngredientRecipe
+from ..similarity import schedule_similar_update
+
+
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+def ingredient_recipe_changed(sender, instance, *args, **kwargs):
+    """Пересчет похожих рецептов при изменении состава рецепта."""
+    schedule_similar_update(instance.recipe_id)
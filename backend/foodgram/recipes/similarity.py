@@ -0,0 +1,203 @@
+import logging
+import random
+import threading
+from collections import defaultdict
+from itertools import combinations
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+
+from .background import submit
+from .models import IngredientRecipe, SimilarRecipe
+
+logger = logging.getLogger(__name__)
+
+SIMILAR_RECIPES_LIMIT = getattr(settings, 'SIMILAR_RECIPES_LIMIT', 10)
+# Параметры LSH: BANDS полос по ROWS значений MinHash. Пары с
+# коэффициентом Жаккара выше ~(1/BANDS)^(1/ROWS) почти наверняка
+# попадают в общую корзину хотя бы одной полосы.
+BANDS = getattr(settings, 'SIMILAR_RECIPES_LSH_BANDS', 20)
+ROWS = getattr(settings, 'SIMILAR_RECIPES_LSH_ROWS', 3)
+# Корзины больше этого размера (частые сочетания вроде соли с сахаром)
+# пропускаются: они дают квадратичное число слабых кандидатов.
+MAX_BUCKET_SIZE = getattr(settings, 'SIMILAR_RECIPES_MAX_BUCKET', 200)
+BATCH_SIZE = 1000
+
+PRIME = (1 << 61) - 1
+_random = random.Random(20230518)
+PERMUTATIONS = [
+    (_random.randrange(1, PRIME), _random.randrange(PRIME))
+    for _ in range(BANDS * ROWS)
+]
+
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def jaccard(first, second):
+    return len(first & second) / len(first | second)
+
+
+def minhash(ingredients):
+    '''MinHash-сигнатура множества id ингредиентов.'''
+    return [
+        min((a * x + b) % PRIME for x in ingredients)
+        for a, b in PERMUTATIONS
+    ]
+
+
+def load_ingredient_sets():
+    '''{id рецепта: множество id ингредиентов} одним проходом.'''
+    sets = defaultdict(set)
+    rows = IngredientRecipe.objects.order_by().values_list(
+        'recipe_id', 'ingredient_id'
+    )
+    for recipe_id, ingredient_id in rows.iterator(chunk_size=BATCH_SIZE):
+        sets[recipe_id].add(ingredient_id)
+    return sets
+
+
+def candidate_pairs(signatures):
+    '''Пары рецептов, совпавших хотя бы в одной полосе сигнатуры.'''
+    for band in range(BANDS):
+        start = band * ROWS
+        buckets = defaultdict(list)
+        for recipe_id, signature in signatures.items():
+            buckets[tuple(signature[start:start + ROWS])].append(recipe_id)
+        for bucket in buckets.values():
+            if 1 < len(bucket) <= MAX_BUCKET_SIZE:
+                yield from combinations(bucket, 2)
+
+
+def add_neighbor(neighbors, recipe_id, similar_id, score):
+    '''Добавляет соседа, оставляя SIMILAR_RECIPES_LIMIT лучших.'''
+    top = neighbors[recipe_id]
+    if similar_id in top:
+        return
+    top[similar_id] = score
+    if len(top) > SIMILAR_RECIPES_LIMIT:
+        del top[min(top, key=top.get)]
+
+
+def build_similar_recipes():
+    '''Полный пересчет таблицы похожих рецептов.
+
+    Кандидаты подбираются через MinHash/LSH, поэтому работа растет
+    почти линейно с числом рецептов, а не квадратично; для кандидатов
+    коэффициент Жаккара считается точно. Возвращает число записей.
+    '''
+    sets = load_ingredient_sets()
+    signatures = {
+        recipe_id: minhash(ingredients)
+        for recipe_id, ingredients in sets.items()
+    }
+    neighbors = defaultdict(dict)
+    for first, second in candidate_pairs(signatures):
+        score = jaccard(sets[first], sets[second])
+        add_neighbor(neighbors, first, second, score)
+        add_neighbor(neighbors, second, first, score)
+    entries = [
+        SimilarRecipe(recipe_id=recipe_id, similar_id=similar_id, score=score)
+        for recipe_id, top in neighbors.items()
+        for similar_id, score in top.items()
+    ]
+    with transaction.atomic():
+        SimilarRecipe.objects.all().delete()
+        SimilarRecipe.objects.bulk_create(entries, batch_size=BATCH_SIZE)
+    return len(entries)
+
+
+def update_similar_recipes(recipe_id):
+    '''Пересчет соседей одного рецепта после изменения его состава.
+
+    Пересечения со всеми рецептами, у которых есть общие ингредиенты,
+    считаются одним запросом по индексу IngredientRecipe. Рецепт также
+    добавляется в списки тех соседей, в чьи лучшие он теперь входит.
+    '''
+    ingredients = set(
+        IngredientRecipe.objects.filter(recipe=recipe_id).values_list(
+            'ingredient_id', flat=True
+        )
+    )
+    sizes = IngredientRecipe.objects.filter(
+        recipe=OuterRef('recipe')
+    ).order_by().values('recipe').annotate(
+        count=Count('id')
+    ).values('count')
+    overlaps = IngredientRecipe.objects.filter(
+        ingredient__in=ingredients
+    ).exclude(recipe=recipe_id).order_by().values('recipe').annotate(
+        overlap=Count('id'), size=Subquery(sizes)
+    ).values_list('recipe', 'overlap', 'size')
+    scores = sorted(
+        (
+            (overlap / (len(ingredients) + size - overlap), similar_id)
+            for similar_id, overlap, size in overlaps
+        ),
+        reverse=True,
+    )[:SIMILAR_RECIPES_LIMIT * 10]
+    with transaction.atomic():
+        SimilarRecipe.objects.filter(
+            Q(recipe=recipe_id) | Q(similar=recipe_id)
+        ).delete()
+        SimilarRecipe.objects.bulk_create(
+            [
+                SimilarRecipe(
+                    recipe_id=recipe_id, similar_id=similar_id, score=score
+                )
+                for score, similar_id in scores[:SIMILAR_RECIPES_LIMIT]
+            ] + [
+                SimilarRecipe(
+                    recipe_id=similar_id, similar_id=recipe_id, score=score
+                )
+                for score, similar_id in scores
+            ],
+            ignore_conflicts=True,
+        )
+        trim_neighbors([similar_id for _, similar_id in scores])
+
+
+def trim_neighbors(recipe_ids):
+    '''Оставляет у рецептов не больше SIMILAR_RECIPES_LIMIT соседей.'''
+    neighbors = defaultdict(list)
+    for entry_id, recipe_id, score in SimilarRecipe.objects.filter(
+        recipe__in=recipe_ids
+    ).values_list('id', 'recipe_id', 'score'):
+        neighbors[recipe_id].append((score, entry_id))
+    extra = [
+        entry_id
+        for entries in neighbors.values()
+        for _, entry_id in sorted(entries, reverse=True)[
+            SIMILAR_RECIPES_LIMIT:
+        ]
+    ]
+    SimilarRecipe.objects.filter(id__in=extra).delete()
+
+
+def schedule_similar_update(recipe_id):
+    '''Ставит пересчет соседей рецепта в фон после коммита.
+
+    Несколько изменений состава подряд (строки инлайна в админке)
+    сливаются в один пересчет.
+    '''
+    def add_pending():
+        with _pending_lock:
+            first = not _pending
+            _pending.add(recipe_id)
+        if first:
+            submit(_update_pending_task)
+    transaction.on_commit(add_pending)
+
+
+def _update_pending_task():
+    while True:
+        with _pending_lock:
+            if not _pending:
+                return
+            recipe_id = _pending.pop()
+        try:
+            update_similar_recipes(recipe_id)
+        except Exception:
+            logger.exception('Similar recipes update failed for %s',
+                             recipe_id)
@@ -0,0 +1,26 @@
+import os
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    '''Хранилище файлов, имена которых получены из хэша содержимого.
+
+    Одинаковое имя означает одинаковое содержимое, поэтому уже
+    существующий файл не перезаписывается и не дублируется с суффиксом,
+    а повторно используется. При этом у файла обновляется время
+    изменения: по нему сборщик неиспользуемых файлов и очередь удаления
+    отсчитывают льготный период, и файл, который снова загружают, пока
+    транзакция с рецептом не завершена, не должен считаться старым.
+    '''
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        try:
+            os.utime(self.path(name))
+            return name
+        except FileNotFoundError:
+            return super()._save(name, content)
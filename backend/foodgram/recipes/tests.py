@@ -0,0 +1,344 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from .images import (generate_variants, get_variant_urls, iter_variant_names,
+                     process_image_deletions)
+from .models import (Favorite, Ingredient, IngredientRecipe, Measurement,
+                     PendingImageDeletion, Recipe, ShoppingCart, Tag,
+                     TagRecipe)
+from .shopping_list.aggregation import get_shopping_list
+from .shopping_list.cache import artifact_cache
+
+User = get_user_model()
+
+
+def create_user(name):
+    return User.objects.create_user(
+        username=name, email=f'{name}@example.com', password='pass',
+        first_name=name, last_name=name,
+    )
+
+
+def create_recipe(author, name, **kwargs):
+    kwargs.setdefault('text', f'описание {name}')
+    kwargs.setdefault('image', f'recipes/{name}.png')
+    kwargs.setdefault('cooking_time', 10)
+    return Recipe.objects.create(author=author, name=name, **kwargs)
+
+
+def collect_pages(client, url, params):
+    '''Id рецептов всех страниц курсорной выдачи по ссылкам next.'''
+    ids = []
+    response = client.get(url, dict(params, cursor=''))
+    for _ in range(100):
+        ids.extend(recipe['id'] for recipe in response.data['results'])
+        if not response.data['next']:
+            return ids
+        response = client.get(response.data['next'])
+    raise AssertionError('Курсор не дошел до последней страницы.')
+
+
+class ShoppingListTests(TestCase):
+    '''Сводный список покупок по корзине из нескольких рецептов.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, other = create_user('buyer'), create_user('other')
+        cls.author = other
+        grams = Measurement.objects.create(name='г')
+        pieces = Measurement.objects.create(name='шт')
+        cls.flour = Ingredient.objects.create(
+            name='мука', measurement_unit=grams
+        )
+        cls.eggs = Ingredient.objects.create(
+            name='яйца', measurement_unit=pieces
+        )
+        cls.sugar = Ingredient.objects.create(
+            name='сахар', measurement_unit=grams
+        )
+        cls.tags = tags = [
+            Tag.objects.create(name=name, color=color, slug=name)
+            for name, color in (('breakfast', '#FF0000'),
+                                ('dessert', '#00FF00'))
+        ]
+        compositions = [
+            {cls.flour: 200, cls.eggs: 2, cls.sugar: 50},
+            {cls.flour: 300, cls.eggs: 3},
+        ]
+        for number, composition in enumerate(compositions):
+            recipe = create_recipe(other, f'рецепт {number}')
+            IngredientRecipe.objects.bulk_create(
+                IngredientRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=amount
+                )
+                for ingredient, amount in composition.items()
+            )
+            # Лишние связи рецепта не должны размножать строки суммы.
+            TagRecipe.objects.bulk_create(
+                TagRecipe(recipe=recipe, tag=tag) for tag in tags
+            )
+            for user in (cls.user, other):
+                ShoppingCart.objects.create(user=user, recipe=recipe)
+                Favorite.objects.create(user=user, recipe=recipe)
+
+    def setUp(self):
+        # Версии корзин откатываются вместе с транзакцией теста, поэтому
+        # ключи готовых документов между тестами повторяются.
+        artifact_cache.clear()
+
+    def test_shared_ingredients_are_summed_once(self):
+        totals = {
+            row['ingredient_id']: row['total_amount']
+            for row in get_shopping_list(self.user)
+        }
+        self.assertEqual(totals, {
+            self.flour.id: 500,
+            self.eggs.id: 5,
+            self.sugar.id: 50,
+        })
+
+    def test_download_contains_the_same_totals(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(
+            '/api/recipes/download_shopping_cart/', {'format': 'json'}
+        )
+        self.assertEqual(response.status_code, 200)
+        rows = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(rows, [
+            {'name': 'мука', 'measurement_unit': 'г', 'amount': 500},
+            {'name': 'сахар', 'measurement_unit': 'г', 'amount': 50},
+            {'name': 'яйца', 'measurement_unit': 'шт', 'amount': 5},
+        ])
+
+    def test_not_modified_until_cart_changes(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = '/api/recipes/download_shopping_cart/'
+
+        def download(etag=None):
+            headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+            return client.get(url, {'format': 'txt'}, **headers)
+
+        etag = download()['ETag']
+        response = download(etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        recipe = Recipe.objects.filter(in_shopping_cart__user=self.user)[0]
+
+        def change_amount():
+            item = IngredientRecipe.objects.get(
+                recipe=recipe, ingredient=self.flour
+            )
+            item.amount += 1
+            item.save()
+
+        changes = (
+            change_amount,
+            lambda: client.delete(f'/api/recipes/{recipe.id}/shopping_cart/'),
+            lambda: client.post(f'/api/recipes/{recipe.id}/shopping_cart/'),
+        )
+        for change in changes:
+            change()
+            response = download(etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+            etag = response['ETag']
+
+    def test_recipe_edit_through_api_changes_the_list(self):
+        buyer = APIClient()
+        buyer.force_authenticate(self.user)
+        url = '/api/recipes/download_shopping_cart/'
+        etag = buyer.get(url, {'format': 'txt'})['ETag']
+
+        author = APIClient()
+        author.force_authenticate(self.author)
+        recipe = Recipe.objects.get(name='рецепт 1')
+        response = author.patch(f'/api/recipes/{recipe.id}/', {
+            'ingredients': [
+                {'id': self.flour.id, 'amount': 300},
+                {'id': self.sugar.id, 'amount': 25},
+            ],
+            'tags': [tag.id for tag in self.tags],
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+
+        response = buyer.get(
+            url, {'format': 'txt'}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('сахар (г) - 75', content)
+        self.assertIn('яйца (шт) - 2', content)
+
+    def test_renaming_ingredient_or_unit_changes_the_list(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = '/api/recipes/download_shopping_cart/'
+        etag = client.get(url, {'format': 'txt'})['ETag']
+        self.flour.name = 'мука пшеничная'
+        self.flour.save()
+        self.eggs.measurement_unit.name = 'штук'
+        self.eggs.measurement_unit.save()
+        response = client.get(
+            url, {'format': 'txt'}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('мука пшеничная (г) - 500', content)
+        self.assertIn('яйца (штук) - 5', content)
+
+
+class RecipeCursorPaginationTests(TestCase):
+    '''Курсорная выдача рецептов при одинаковых значениях порядка.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        # Пять рецептов с "суп" в названии ранжируются выше трех, где
+        # слово есть только в описании: внутри групп ранги равны.
+        cls.recipes = [
+            create_recipe(
+                cls.author, f'{"суп" if number < 5 else "блюдо"} {number}',
+                text=f'суп на каждый день {number}',
+                cooking_time=number % 2 + 1,
+            )
+            for number in range(8)
+        ]
+        create_recipe(cls.author, 'каша', text='без бульона')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def test_search_pages_cover_tied_ranks(self):
+        ids = collect_pages(
+            self.client, '/api/recipes/', {'search': 'суп', 'limit': 1}
+        )
+        by_name_first = sorted(
+            self.recipes, key=lambda recipe: (
+                not recipe.name.startswith('суп'), -recipe.id
+            )
+        )
+        self.assertEqual(ids, [recipe.id for recipe in by_name_first])
+
+    def test_ordering_ties_across_pages(self):
+        recipes = Recipe.objects.all()
+        # id добавляется в направлении поля - как в индексе (поле, id).
+        for ordering, key in (
+            ('cooking_time', lambda recipe: (recipe.cooking_time, recipe.id)),
+            ('-cooking_time',
+             lambda recipe: (-recipe.cooking_time, -recipe.id)),
+        ):
+            with self.subTest(ordering=ordering):
+                ids = collect_pages(
+                    self.client, '/api/recipes/',
+                    {'ordering': ordering, 'limit': 2},
+                )
+                expected = sorted(recipes, key=key)
+                self.assertEqual(ids, [recipe.id for recipe in expected])
+
+    def test_previous_link_returns_previous_page(self):
+        params = {'ordering': 'cooking_time', 'limit': 3, 'cursor': ''}
+        first = self.client.get('/api/recipes/', params).data
+        second = self.client.get(first['next']).data
+        self.assertIsNone(first['previous'])
+        previous = self.client.get(second['previous']).data
+        self.assertEqual(previous['results'], first['results'])
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get(
+            '/api/recipes/', {'cursor': 'broken', 'limit': 2}
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class ImageVariantsTests(TestCase):
+    '''Варианты изображения, общие для рецептов с одинаковой картинкой.'''
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        content = self.make_image((255, 0, 0, 128))
+        # Одно и то же содержимое, загруженное с разными расширениями.
+        self.recipes = [
+            create_recipe(
+                create_user(f'author{number}'), f'рецепт {number}',
+                image=ContentFile(content, name=f'photo.{ext}'),
+            )
+            for number, ext in enumerate(('jpg', 'jpeg'))
+        ]
+        self.storage = Recipe._meta.get_field('image').storage
+
+    def make_image(self, color):
+        buffer = io.BytesIO()
+        Image.new('RGBA', (40, 40), color).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def make_old(self, name):
+        os.utime(self.storage.path(name), (0, 0))
+
+    def delete_recipe(self, recipe):
+        self.make_old(recipe.image.name)
+        recipe.delete()
+        process_image_deletions()
+
+    def test_variants_are_shared_by_content(self):
+        first, second = self.recipes
+        self.assertEqual(first.image_hash, second.image_hash)
+        self.assertNotEqual(first.image.name, second.image.name)
+        generate_variants(Recipe, first.image.name, first.image_hash)
+        second.refresh_from_db()
+        self.assertTrue(second.has_image_variants)
+        for name in iter_variant_names(second.image_hash):
+            self.assertTrue(self.storage.exists(name), name)
+        self.assertIsNotNone(get_variant_urls(second))
+
+    def test_variants_deleted_with_last_recipe_using_them(self):
+        first, second = self.recipes
+        generate_variants(Recipe, first.image.name, first.image_hash)
+        variants = list(iter_variant_names(first.image_hash))
+
+        self.delete_recipe(first)
+        self.assertFalse(self.storage.exists(first.image.name))
+        self.assertTrue(self.storage.exists(second.image.name))
+        for name in variants:
+            self.assertTrue(self.storage.exists(name), name)
+
+        self.delete_recipe(second)
+        self.assertFalse(self.storage.exists(second.image.name))
+        for name in variants:
+            self.assertFalse(self.storage.exists(name), name)
+
+    def test_replaced_image_is_deleted_after_grace_period(self):
+        recipe = self.recipes[0]
+        old_name = recipe.image.name
+        recipe.image = ContentFile(
+            self.make_image((0, 0, 255, 255)), name='new.png'
+        )
+        recipe.save()
+        self.assertTrue(
+            PendingImageDeletion.objects.filter(name=old_name).exists()
+        )
+        process_image_deletions()
+        self.assertTrue(self.storage.exists(old_name))
+
+        self.make_old(old_name)
+        process_image_deletions()
+        self.assertFalse(self.storage.exists(old_name))
+        self.assertTrue(self.storage.exists(recipe.image.name))
+        self.assertFalse(PendingImageDeletion.objects.exists())
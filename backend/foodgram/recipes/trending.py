@@ -0,0 +1,91 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from .models import Favorite, ShoppingCart, TrendingScore
+from .versions import bump_version, get_version
+
+# Вклад одного добавления в оценку рецепта.
+TRENDING_WEIGHTS = getattr(settings, 'TRENDING_WEIGHTS', {
+    Favorite: 1.0,
+    ShoppingCart: 0.5,
+})
+HALF_LIFE = timedelta(hours=getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 24))
+WINDOW = timedelta(days=getattr(settings, 'TRENDING_WINDOW_DAYS', 7))
+MIN_SCORE = getattr(settings, 'TRENDING_MIN_SCORE', 0.01)
+TRENDING_LIMIT = getattr(settings, 'TRENDING_LIMIT', 500)
+CACHE_TIMEOUT = getattr(settings, 'TRENDING_CACHE_TIMEOUT', 300)
+CACHE_KEY = 'trending_recipe_ids:{}'
+VERSION_NAME = 'trending'
+
+
+def decay(age):
+    '''Множитель затухания для события возраста age.'''
+    return 0.5 ** (age / HALF_LIFE)
+
+
+def compute_trending_scores(full=False):
+    '''Инкрементальный пересчет оценок популярности.
+
+    Оценка хранится на момент последнего расчета, поэтому при новом
+    запуске старые оценки затухают одним UPDATE, а к ним добавляются
+    только события, появившиеся после прошлого расчета. При full=True
+    или пустой таблице оценки строятся заново по событиям за WINDOW.
+    Возвращает число рецептов с оценкой.
+    '''
+    now = timezone.now()
+    with transaction.atomic():
+        last = None
+        if not full:
+            last = TrendingScore.objects.aggregate(
+                last=Max('updated')
+            )['last']
+        if last is None:
+            TrendingScore.objects.all().delete()
+            since = now - WINDOW
+        else:
+            since = last
+            TrendingScore.objects.update(
+                score=F('score') * decay(now - last), updated=now
+            )
+        deltas = defaultdict(float)
+        for model, weight in TRENDING_WEIGHTS.items():
+            events = model.objects.filter(
+                created__gt=since, created__lte=now
+            ).values_list('recipe_id', 'created')
+            for recipe_id, created in events.iterator():
+                deltas[recipe_id] += weight * decay(now - created)
+        existing = TrendingScore.objects.in_bulk(list(deltas))
+        for recipe_id, score in existing.items():
+            score.score += deltas.pop(recipe_id)
+        TrendingScore.objects.bulk_update(existing.values(), ['score'])
+        TrendingScore.objects.bulk_create([
+            TrendingScore(recipe_id=recipe_id, score=score, updated=now)
+            for recipe_id, score in deltas.items()
+        ])
+        TrendingScore.objects.filter(score__lt=MIN_SCORE).delete()
+        bump_version(VERSION_NAME)
+    return TrendingScore.objects.count()
+
+
+def get_trending_ids():
+    '''Id рецептов по убыванию оценки (не больше TRENDING_LIMIT).
+
+    Кэш привязан к версии расчета в БД: пересчет в другом процессе
+    (команда по расписанию) меняет версию, и все процессы сразу
+    читают новый список. Старые ключи истекают через CACHE_TIMEOUT.
+    '''
+    key = CACHE_KEY.format(get_version(VERSION_NAME))
+    ids = cache.get(key)
+    if ids is None:
+        ids = list(
+            TrendingScore.objects.order_by('-score', 'recipe')
+            .values_list('recipe_id', flat=True)[:TRENDING_LIMIT]
+        )
+        cache.set(key, ids, CACHE_TIMEOUT)
+    return ids
@@ -1,7 +1,13 @@
 import re
 
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
+from PIL import Image, UnidentifiedImageError
+
+IMAGE_MAX_BYTES = getattr(settings, 'RECIPE_IMAGE_MAX_BYTES', 5 * 1024 * 1024)
+IMAGE_MAX_SIDE = getattr(settings, 'RECIPE_IMAGE_MAX_SIDE', 4096)
+IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
 
 
 def validate_slug(value):
@@ -10,3 +16,36 @@ def validate_slug(value):
         raise ValidationError(_(
             f'{value} содержит запрещенные символы: ({forbidden_symb}).'
         ))
+
+
+def validate_image_size(size):
+    if size > IMAGE_MAX_BYTES:
+        raise ValidationError(_(
+            f'Размер изображения не должен превышать '
+            f'{IMAGE_MAX_BYTES // (1024 * 1024)} МБ.'
+        ))
+
+
+def validate_image_header(file):
+    '''Проверка изображения по размеру файла и заголовку - до полного
+    декодирования: формат и размеры в пикселях.
+    '''
+    validate_image_size(file.size)
+    try:
+        with Image.open(file) as image:
+            image_format = image.format
+            width, height = image.size
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        raise ValidationError(_('Загрузите корректное изображение.'))
+    finally:
+        file.seek(0)
+    if image_format not in IMAGE_FORMATS:
+        raise ValidationError(_(
+            f'Формат {image_format} не поддерживается, допустимые: '
+            f'{", ".join(IMAGE_FORMATS)}.'
+        ))
+    if max(width, height) > IMAGE_MAX_SIDE:
+        raise ValidationError(_(
+            f'Изображение не должно быть больше '
+            f'{IMAGE_MAX_SIDE}x{IMAGE_MAX_SIDE} пикселей.'
+        ))
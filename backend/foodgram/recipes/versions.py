@@ -0,0 +1,22 @@
+from django.db.models import F
+
+from .models import DataVersion
+
+
+def get_version(name):
+    '''Текущая версия набора данных name (0, если он не менялся).'''
+    version = DataVersion.objects.filter(name=name).values_list(
+        'version', flat=True
+    ).first()
+    return version or 0
+
+
+def bump_version(name):
+    '''Увеличивает версию набора данных name одним UPDATE.'''
+    if not DataVersion.objects.filter(name=name).update(
+        version=F('version') + 1
+    ):
+        DataVersion.objects.get_or_create(name=name)
+        DataVersion.objects.filter(name=name).update(
+            version=F('version') + 1
+        )
@@ -1,24 +1,31 @@
 import datetime
-import io
 
-from django.db.models import Prefetch, Sum
-from django.http import HttpResponse
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db.models import Prefetch
+from django.http import HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags
 from django_filters.rest_framework import DjangoFilterBackend
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
-from rest_framework import filters, status, viewsets
+from foodgram.pagination import CustomSetPagination, RecipeSetPagination
+from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 from .exceptions import NotFoundRecipe
-from .filters import IngredientFilterBackend, RecipeFilterBackend
-from .models import Ingredient, IngredientRecipe, Recipe, ShoppingCart, Tag
+from .feed import FEED_MAX_LENGTH, decode_cursor, encode_cursor, get_feed_page
+from .filters import (IngredientFilterBackend, RecipeFilterBackend,
+                      RecipeOrderingFilter)
+from .ingredient_index import ingredient_index
+from .models import Ingredient, IngredientRecipe, Recipe, SimilarRecipe, Tag
 from .serializers import (AddRecipeSerializer, FavoriteSerializer,
-                          IngredientSerializer, ShoppingCartSerializer,
-                          TagSerializer)
+                          GetRecipeSerializer, IngredientSerializer,
+                          ShoppingCartSerializer, TagSerializer)
+from .shopping_list.aggregation import get_shopping_list
+from .shopping_list.cache import get_document_key, get_etag, get_or_render
+from .shopping_list.renderers import SHOPPING_LIST_RENDERERS, iter_chunks
+from .trending import get_trending_ids
 
 # from django.utils.decorators import method_decorator
 # from query_counter.decorators import queries_counter
@@ -41,6 +48,15 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
     filterset_class = IngredientFilterBackend
 
+    def list(self, request, *args, **kwargs):
+        '''Автодополнение по названию отдается из индекса в памяти.'''
+        if not set(request.query_params) <= {'name', 'format'}:
+            return super().list(request, *args, **kwargs)
+        name = request.query_params.get('name')
+        if name is None:
+            return Response(ingredient_index.all())
+        return Response(ingredient_index.search(name))
+
 
 # @method_decorator(queries_counter, name='dispatch')
 class RecipeViewSet(viewsets.ModelViewSet):
@@ -48,15 +64,27 @@ class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.select_related('author').prefetch_related(
         Prefetch(
             'recipe_in_ingredient',
-            queryset=IngredientRecipe.objects.select_related('ingredient')
+            queryset=IngredientRecipe.objects.select_related(
+                'ingredient__measurement_unit'
+            )
         ),
         'tags',
-    ).all()
+    ).defer('search_vector')
     serializer_class = AddRecipeSerializer
-    filter_backends = (DjangoFilterBackend, filters.OrderingFilter)
+    filter_backends = (DjangoFilterBackend, RecipeOrderingFilter)
     filterset_class = RecipeFilterBackend
-    ordering = ('-date_created')
-    pagination_class = None
+    ordering = ('-date_created', '-id')
+    pagination_class = RecipeSetPagination
+
+    def initialize_request(self, request, *args, **kwargs):
+        '''Файлы из multipart-запросов пишутся во временные файлы
+        частями, а не собираются в памяти.
+        '''
+        request.upload_handlers = [TemporaryFileUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
+    def get_queryset(self):
+        return self.queryset.with_user_flags(self.request.user)
 
     def post_del_for_shop_cart_and_favorite(
         self, request, pk, serializer, error_text
@@ -110,44 +138,108 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(
         methods=['get', ],
         detail=False,
+        pagination_class=CustomSetPagination,
     )
-    def download_shopping_cart(self, request):
-        response = HttpResponse(content_type='application/pdf')
-        cur_date = datetime.date.today()
-        response['Content-Disposition'] = (
-            f'inline; filename="Купить {cur_date}.pdf"'
+    def trending(self, request):
+        '''Популярные сейчас рецепты по заранее рассчитанным оценкам.'''
+        page = self.paginate_queryset(get_trending_ids())
+        recipes = self.get_queryset().in_bulk(page)
+        serializer = GetRecipeSerializer(
+            [recipes[pk] for pk in page if pk in recipes],
+            many=True,
+            context={'request': request},
         )
+        return self.get_paginated_response(serializer.data)
 
-        user = self.request.user
-        purchase_queryset = ShoppingCart.objects.filter(user=user).values_list(
-            'recipe__ingredients__name',
-            'recipe__ingredients__measurement_unit__name',
-        ).annotate(sum=Sum('recipe__recipe_in_ingredient__amount'))
-
-        pdfmetrics.registerFont(TTFont('DejaVuSerif', 'data/DejaVuSerif.ttf'))
-
-        buffer = io.BytesIO()
-        p = canvas.Canvas(buffer, pagesize=A4)
-
-        p.setFont('DejaVuSerif', 15, leading=None)
-        p.setFillColorRGB(0.29296875, 0.453125, 0.609375)
-        p.drawString(260, 800, 'Foodgram')
-        p.line(0, 780, 1000, 780)
-        p.line(0, 778, 1000, 778)
-        x1 = 20
-        y1 = 750
-
-        for elem in purchase_queryset:
-            p.setFont('DejaVuSerif', 12, leading=None)
-            p.drawString(x1, y1 - 20, f'{elem[0]} ({elem[1]}) - {elem[2]}')
-            y1 -= 20
-
-        p.setTitle(f'Список покупок на {cur_date}')
-        p.showPage()
-        p.save()
+    @action(
+        methods=['get', ],
+        detail=True,
+    )
+    def similar(self, request, pk):
+        '''Рецепты с наиболее похожим составом из заранее
+        рассчитанной таблицы.
+        '''
+        if not Recipe.objects.filter(pk=pk).exists():
+            raise NotFoundRecipe()
+        similar_ids = list(
+            SimilarRecipe.objects.filter(recipe=pk).order_by(
+                '-score', 'similar'
+            ).values_list('similar_id', flat=True)
+        )
+        recipes = self.get_queryset().in_bulk(similar_ids)
+        serializer = GetRecipeSerializer(
+            [recipes[pk] for pk in similar_ids if pk in recipes],
+            many=True,
+            context={'request': request},
+        )
+        return Response(serializer.data)
 
-        pdf = buffer.getvalue()
-        buffer.close()
-        response.write(pdf)
+    @action(
+        methods=['get', ],
+        detail=False,
+    )
+    def feed(self, request):
+        '''Лента рецептов авторов из подписок, от новых к старым.
+
+        Постраничная выдача по курсору: ссылка на следующую страницу
+        передается в поле next.
+        '''
+        paginator = self.paginator
+        limit = min(
+            paginator.get_page_size(request) or paginator.page_size,
+            FEED_MAX_LENGTH,
+        )
+        cursor = request.query_params.get('cursor')
+        try:
+            position = decode_cursor(cursor) if cursor else None
+        except ValueError:
+            raise NotFound('Некорректный курсор.')
+        rows, has_next = get_feed_page(request.user, limit, position)
+        recipes = self.get_queryset().in_bulk([pk for _, pk in rows])
+        serializer = GetRecipeSerializer(
+            [recipes[pk] for _, pk in rows if pk in recipes],
+            many=True,
+            context={'request': request},
+        )
+        next_link = None
+        if has_next:
+            next_link = replace_query_param(
+                request.build_absolute_uri(), 'cursor',
+                encode_cursor(*rows[-1]),
+            )
+        return Response({'next': next_link, 'results': serializer.data})
 
+    @action(
+        methods=['get', ],
+        detail=False,
+        renderer_classes=SHOPPING_LIST_RENDERERS,
+    )
+    def download_shopping_cart(self, request):
+        cur_date = datetime.date.today()
+        renderer = request.accepted_renderer
+        user = self.request.user
+        key = get_document_key(user, renderer, cur_date)
+        etag = get_etag(key)
+
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+
+        content = get_or_render(
+            key,
+            lambda: renderer.stream(
+                get_shopping_list(user), f'Список покупок на {cur_date}'
+            ),
+        )
+        response = StreamingHttpResponse(
+            iter_chunks(content),
+            content_type=renderer.get_content_type(),
+        )
+        response['Content-Disposition'] = (
+            f'{renderer.disposition}; '
+            f'filename="Купить {cur_date}.{renderer.format}"'
+        )
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
         return response
@@ -7,6 +7,7 @@ User = get_user_model()
 
 
 class UserAdmin(admin.ModelAdmin):
+    list_display = ('username', 'email', 'recipes_count', 'followers_count')
     list_filter = ('email', 'username')
 
 
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.19 on 2026-10-18 16:51
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_followers_count(apps, schema_editor):
+    User = apps.get_model('users', 'ExtUser')
+    Follow = apps.get_model('users', 'Follow')
+    followers = Follow.objects.filter(
+        author=OuterRef('pk')
+    ).values('author').annotate(count=Count('id')).values('count')
+    User.objects.update(followers_count=Coalesce(
+        Subquery(followers, output_field=IntegerField()), 0
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_auto_20230518_1639'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='extuser',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Кол-во подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='extuser',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Кол-во рецептов'),
+        ),
+        migrations.RunPython(fill_followers_count, migrations.RunPython.noop),
+    ]
@@ -26,6 +26,16 @@ class ExtUser(AbstractUser):
         max_length=150,
     )
     password = models.CharField('password', max_length=150)
+    recipes_count = models.PositiveIntegerField(
+        'Кол-во рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        'Кол-во подписчиков',
+        default=0,
+        editable=False,
+    )
 
     REQUIRED_FIELDS = ['email', 'first_name', 'last_name']
 
@@ -5,7 +5,9 @@ from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator, UniqueValidator
 
 from .models import Follow
-from .validators import validate_username, validate_email
+from .subscriptions import (get_recipes_limit, get_subscribed_ids,
+                            prefetch_author_recipes)
+from .validators import validate_email, validate_username
 
 User = get_user_model()
 
@@ -25,10 +27,9 @@ class CustomUserSerializer(UserSerializer):
         read_only_fields = (settings.LOGIN_FIELD,)
 
     def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return Follow.objects.filter(user=user, author=obj).exists()
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return obj.pk in get_subscribed_ids(self.context['request'])
 
 
 class CustomUserCreateSerializer(UserCreateSerializer):
@@ -81,18 +82,18 @@ class AddFollowSerializer(serializers.ModelSerializer):
         return value
 
     def to_representation(self, instance):
-        context = {'request': self.context.get('request')}
-        return GetFollowSerializer(instance.author, context=context).data
+        request = self.context.get('request')
+        prefetch_author_recipes([instance.author], request)
+        return GetFollowSerializer(
+            instance.author,
+            context={'request': request}
+        ).data
 
 
 class GetFollowSerializer(CustomUserSerializer):
     """Сериализатор для отображения расширенной информации о подписках."""
-    from recipes.serializers import GetRecipeShortSerializer
-    recipes = GetRecipeShortSerializer(
-        read_only=True,
-        many=True,
-    )
-    recipes_count = serializers.SerializerMethodField()
+    recipes = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta(CustomUserSerializer.Meta):
         fields = CustomUserSerializer.Meta.fields + (
@@ -100,5 +101,14 @@ class GetFollowSerializer(CustomUserSerializer):
             'recipes_count'
         )
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
+    def get_recipes(self, obj):
+        from recipes.serializers import GetRecipeShortSerializer
+        recipes = obj.recipes.all()
+        recipes_limit = get_recipes_limit(self.context['request'])
+        if recipes_limit is not None:
+            recipes = recipes[:recipes_limit]
+        return GetRecipeShortSerializer(
+            recipes,
+            many=True,
+            context=self.context,
+        ).data
@@ -0,0 +1,60 @@
+from django.db.models import (BooleanField, Exists, OuterRef, Prefetch, Value,
+                              prefetch_related_objects)
+
+from recipes.models import Recipe
+
+from .models import Follow
+
+
+def get_subscribed_ids(request):
+    '''Множество id авторов, на которых подписан текущий пользователь.
+
+    Загружается одним запросом и кэшируется на объекте запроса, поэтому
+    признак is_subscribed для любого числа пользователей в ответе
+    вычисляется без дополнительных обращений к БД.
+    '''
+    subscribed_ids = getattr(request, '_subscribed_ids', None)
+    if subscribed_ids is None:
+        user = request.user
+        if user.is_anonymous:
+            subscribed_ids = frozenset()
+        else:
+            subscribed_ids = frozenset(
+                Follow.objects.filter(user=user).values_list(
+                    'author_id', flat=True
+                )
+            )
+        request._subscribed_ids = subscribed_ids
+    return subscribed_ids
+
+
+def get_recipes_limit(request):
+    '''Значение параметра recipes_limit запроса или None, если не задан.'''
+    recipes_limit = request.query_params.get('recipes_limit')
+    if recipes_limit is None or not recipes_limit.isdigit():
+        return None
+    return int(recipes_limit)
+
+
+def prefetch_author_recipes(authors, request):
+    '''Подгружает рецепты авторов одним запросом с учетом recipes_limit.'''
+    recipes = Recipe.objects.filter(author__in=authors)
+    recipes_limit = get_recipes_limit(request)
+    if recipes_limit is not None:
+        recipes = recipes.latest_per_author(recipes_limit)
+    else:
+        recipes = recipes.order_by('-date_created', '-id')
+    prefetch_related_objects(authors, Prefetch('recipes', queryset=recipes))
+
+
+def annotate_is_subscribed(queryset, user):
+    '''Добавляет к набору пользователей признак подписки на них.'''
+    if user.is_anonymous:
+        return queryset.annotate(
+            is_subscribed=Value(False, output_field=BooleanField())
+        )
+    return queryset.annotate(
+        is_subscribed=Exists(
+            Follow.objects.filter(user=user, author=OuterRef('pk'))
+        )
+    )
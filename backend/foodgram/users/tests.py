@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from recipes.models import Recipe
+from rest_framework.test import APIClient
+
+from .models import Follow
+
+User = get_user_model()
+
+
+def create_user(name):
+    return User.objects.create_user(
+        username=name, email=f'{name}@example.com', password='pass',
+        first_name=name, last_name=name,
+    )
+
+
+class SubscriptionsTests(TestCase):
+    '''Список подписок с ограничением числа рецептов автора.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader')
+        cls.newcomer = create_user('newcomer')
+        cls.recipes = {}
+        for name, count in (('first', 4), ('second', 1)):
+            author = create_user(name)
+            Follow.objects.create(user=cls.reader, author=author)
+            cls.recipes[author.id] = [
+                Recipe.objects.create(
+                    author=author, name=f'{name} {number}',
+                    text=f'{name} {number}',
+                    image=f'recipes/{name}_{number}.png', cooking_time=5,
+                ).id
+                for number in range(count)
+            ]
+
+    def get_subscriptions(self, user, **params):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/api/users/subscriptions/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_no_subscriptions(self):
+        for params in ({}, {'recipes_limit': 3}):
+            with self.subTest(params=params):
+                self.assertEqual(
+                    self.get_subscriptions(self.newcomer, **params), []
+                )
+
+    def test_recipes_limit_keeps_latest_recipes_of_each_author(self):
+        results = self.get_subscriptions(self.reader, recipes_limit=2)
+        recipes = {
+            author['id']: [recipe['id'] for recipe in author['recipes']]
+            for author in results
+        }
+        self.assertEqual(recipes, {
+            author_id: ids[::-1][:2]
+            for author_id, ids in self.recipes.items()
+        })
+        counts = {author['id']: author['recipes_count'] for author in results}
+        self.assertEqual(counts, {
+            author_id: len(ids) for author_id, ids in self.recipes.items()
+        })
+
+    def test_without_recipes_limit_all_recipes_are_listed(self):
+        results = self.get_subscriptions(self.reader)
+        self.assertEqual(
+            sorted(len(author['recipes']) for author in results), [1, 4]
+        )
@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from django.db.models import BooleanField, Value
 from djoser.views import UserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
@@ -6,12 +7,18 @@ from rest_framework.response import Response
 
 from .exceptions import NotFoundAuthor
 from .serializers import AddFollowSerializer, GetFollowSerializer
+from .subscriptions import annotate_is_subscribed, prefetch_author_recipes
 
 User = get_user_model()
 
 
 class CustomUserViewSet(UserViewSet):
     '''Обработка запросов при работе с пользователями и подписками.'''
+    def get_queryset(self):
+        return annotate_is_subscribed(
+            super().get_queryset(), self.request.user
+        )
+
     @action(["get", ], detail=False)
     def me(self, request, *args, **kwargs):
         self.get_object = self.get_instance
@@ -50,8 +57,13 @@ class CustomUserViewSet(UserViewSet):
         detail=False,
     )
     def subscriptions(self, request):
-        queryset = User.objects.filter(following__user=request.user)
+        queryset = User.objects.filter(
+            following__user=request.user
+        ).annotate(
+            is_subscribed=Value(True, output_field=BooleanField())
+        )
         page = self.paginate_queryset(queryset)
+        prefetch_author_recipes(page, request)
         serializer = GetFollowSerializer(
             page,
             context={'request': request},